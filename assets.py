@@ -0,0 +1,590 @@
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from concurrent import futures
+from os import walk
+
+import pygame
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg']
+
+#unpinned surfaces are evicted once the cache holds more than this
+ASSET_CACHE_BUDGET = 64 * 1024 * 1024
+
+#pre-scaled frame sheets written by atlas.py
+ATLAS_DIR = 'images/atlas'
+
+#colors tried, in order, as the colorkey for images with on/off transparency
+COLORKEY_CANDIDATES = [(255, 0, 255), (0, 255, 255), (1, 254, 1)]
+
+#decoded and scaled pixels are kept here between runs
+SURFACE_CACHE_DIR = '.cache/surfaces'
+
+#threads that decode and scale images, pygame releases the GIL while they do
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+
+def optimize_surface(surf):
+    """Convert a surface to the cheapest format that still draws the same.
+
+    Fully opaque images become plain display-format surfaces, images whose
+    pixels are either fully opaque or fully transparent get an RLE colorkey,
+    and only real translucency keeps per-pixel alpha.
+    """
+    if not pygame.display.get_surface():
+        return surf
+
+    if not surf.get_flags() & pygame.SRCALPHA:
+        surf = surf.convert()
+        if surf.get_colorkey():
+            surf.set_colorkey(surf.get_colorkey(), pygame.RLEACCEL)
+        return surf
+
+    total = surf.get_width() * surf.get_height()
+    opaque = pygame.mask.from_surface(surf, 254).count()
+    if opaque == total:
+        return surf.convert()
+
+    visible = pygame.mask.from_surface(surf, 0).count()
+    if visible == opaque:
+        for key in COLORKEY_CANDIDATES:
+            keyed = pygame.Surface(surf.get_size()).convert()
+            keyed.fill(key)
+            keyed.blit(surf, (0, 0))
+
+            #the key is only usable if no opaque pixel already has that color
+            if pygame.mask.from_threshold(keyed, key, (1, 1, 1, 255)).count() == total - opaque:
+                keyed.set_colorkey(key, pygame.RLEACCEL)
+                return keyed
+
+    return surf.convert_alpha()
+
+class SurfaceCache:
+    """Decoded, scaled pixels of every image kept on disk between runs.
+
+    Entries are named after the sha1 of the source file and the scale, so an
+    edited image just misses and its old entries are pruned on exit. The
+    index keeps each source's mtime and size so unchanged files are not even
+    hashed again. A hit is memory-mapped and wrapped in a surface as is.
+    """
+    header = struct.Struct('<4s4sII')
+
+    def __init__(self, cache_dir = SURFACE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.lock = threading.Lock()
+        self.index = None
+        self.changed = False
+
+    def digest(self, path):
+        stat = os.stat(path)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        with self.lock:
+            if self.index is None:
+                try:
+                    with open(self.index_path, 'r') as f:
+                        self.index = json.load(f)
+                except (OSError, ValueError):
+                    self.index = {}
+            entry = self.index.get(path)
+        if entry and entry[:2] == stamp:
+            return entry[2]
+
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        with self.lock:
+            self.index[path] = stamp + [digest]
+            if not self.changed:
+                self.changed = True
+                atexit.register(self.save)
+        return digest
+
+    def entry_path(self, path, scale):
+        return os.path.join(self.cache_dir, f'{self.digest(path)}_{scale}.surf')
+
+    def load(self, path, scale):
+        try:
+            with open(self.entry_path(path, scale), 'rb') as f:
+                #copy-on-write, so the surface can be drawn on without touching the file
+                data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_COPY)
+            magic, fmt, width, height = self.header.unpack_from(data)
+        except (OSError, ValueError, struct.error):
+            return None
+
+        fmt = fmt.rstrip(b'\0').decode()
+        if magic != b'SURF' or len(data) != self.header.size + width * height * len(fmt):
+            return None
+        return pygame.image.frombuffer(memoryview(data)[self.header.size:], (width, height), fmt)
+
+    def store(self, path, scale, surf):
+        #colorkeyed palette images are rare, they are simply read from the PNG
+        if surf.get_colorkey():
+            return
+        fmt = 'RGBA' if surf.get_flags() & pygame.SRCALPHA else 'RGB'
+        try:
+            entry = self.entry_path(path, scale)
+            os.makedirs(self.cache_dir, exist_ok = True)
+            temp = f'{entry}.{threading.get_ident()}'
+            with open(temp, 'wb') as f:
+                f.write(self.header.pack(b'SURF', fmt.encode(), *surf.get_size()))
+                f.write(pygame.image.tobytes(surf, fmt))
+            os.replace(temp, entry)
+        except OSError:
+            pass
+
+    def save(self):
+        """Write the index and drop entries of sources that changed or are gone"""
+        with self.lock:
+            if not self.changed:
+                return
+            self.index = {path: entry for path, entry in self.index.items() if os.path.exists(path)}
+            digests = {entry[2] for entry in self.index.values()}
+            try:
+                os.makedirs(self.cache_dir, exist_ok = True)
+                for name in os.listdir(self.cache_dir):
+                    if name.endswith('.surf') and name.split('_')[0] not in digests:
+                        os.remove(os.path.join(self.cache_dir, name))
+                with open(self.index_path + '.tmp', 'w') as f:
+                    json.dump(self.index, f)
+                os.replace(self.index_path + '.tmp', self.index_path)
+            except OSError:
+                pass
+            self.changed = False
+
+
+surface_cache = SurfaceCache()
+
+def read_image(path, scale = 1):
+    """Read an image and resize it by scale, safe on any thread.
+
+    Unchanged images come straight from the surface cache.
+    """
+    surf = surface_cache.load(path, scale)
+    if surf is None:
+        surf = pygame.image.load(path)
+        if scale != 1:
+            new_width = int(surf.get_width() * scale)
+            new_height = int(surf.get_height() * scale)
+            surf = pygame.transform.scale(surf, (new_width, new_height))
+        surface_cache.store(path, scale, surf)
+    return surf
+
+def convert_image(surf, mode = 'auto'):
+    """Display-format conversion, which has to happen on the main thread.
+
+    mode 'auto' picks the blit format, 'alpha' always keeps per-pixel alpha
+    and 'raw' leaves the decoded surface as it is.
+    """
+    if mode == 'auto':
+        return optimize_surface(surf)
+    if mode == 'alpha' and pygame.display.get_surface():
+        return surf.convert_alpha()
+    return surf
+
+def decode_image(path, scale = 1, mode = 'auto'):
+    """Read, resize and convert an image in one go"""
+    return convert_image(read_image(path, scale), mode)
+
+def list_images(path):
+    """Image files in a folder, in natural order (2.png before 10.png)"""
+    files = []
+    for _, __, img_files in walk(path):
+        img_files.sort(key=lambda f: [int(t) if t.isdigit() else t.lower() for t in re.split(r'(\d+)', f)])
+        for image in img_files:
+            # Skip hidden files (like .DS_Store) and non-image files
+            if image.startswith('.') or not os.path.splitext(image)[1].lower() in IMAGE_EXTENSIONS:
+                continue
+            files.append(os.path.join(path, image))
+    return files
+
+def png_size(path):
+    """Width and height from a PNG header, without decoding any pixels"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    return struct.unpack('>II', header[16:24])
+
+def surface_bytes(surf):
+    return surf.get_bytesize() * surf.get_width() * surf.get_height()
+
+
+class Atlas:
+    """Frames packed into a few pre-scaled sheets by atlas.py.
+
+    Only the small index is read, on the first lookup (so creating an Atlas
+    never touches the disk). A sheet is decoded the first time one of its
+    frames is asked for, and frames are handed out as subsurfaces.
+    """
+    def __init__(self, atlas_dir = ATLAS_DIR):
+        self.atlas_dir = atlas_dir
+        self.loaded = False
+        self.frames = {}
+        self.sheet_files = []
+        self.sheets = {}
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        try:
+            with open(os.path.join(self.atlas_dir, 'index.json'), 'r') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+
+        self.sheet_files = index['sheets']
+        for frame in index['frames']:
+            key = (os.path.normpath(frame['path']), frame['scale'])
+            self.frames[key] = (frame['sheet'], pygame.Rect(frame['rect']))
+
+    def sheet_of(self, path, scale):
+        """Index of the sheet holding a frame, or None if it is not packed"""
+        self.load()
+        frame = self.frames.get((os.path.normpath(path), scale))
+        return frame[0] if frame else None
+
+    def sheet_path(self, sheet):
+        return os.path.join(self.atlas_dir, self.sheet_files[sheet])
+
+    def frame(self, path, scale):
+        self.load()
+        key = (os.path.normpath(path), scale)
+        if key not in self.frames:
+            return None
+
+        sheet, rect = self.frames[key]
+        if sheet not in self.sheets:
+            self.sheets[sheet] = decode_image(self.sheet_path(sheet))
+        return self.sheets[sheet].subsurface(rect)
+
+
+class AssetCache:
+    """Decoded surfaces shared by everyone who asks for the same image.
+
+    Entries are keyed by path, scale and conversion mode. acquire() pins an
+    entry until the matching release(); once the cache is over its memory
+    budget the least recently used unpinned entries are evicted.
+    """
+    def __init__(self, budget = ASSET_CACHE_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.refs = {}
+        self.folders = {}
+        self.size = 0
+        self.atlas = Atlas()
+
+    def get(self, path, scale = 1, mode = 'auto'):
+        key = (path, scale, mode)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        surf = self.atlas.frame(path, scale) if mode == 'auto' else None
+        if surf is None:
+            surf = decode_image(path, scale, mode)
+        return self.put(key, surf)
+
+    def put(self, key, surf):
+        self.entries[key] = surf
+        self.size += surface_bytes(surf)
+        self.evict()
+        return surf
+
+    def listing(self, path):
+        """Image paths in a folder, the listing is only read once"""
+        if path not in self.folders:
+            self.folders[path] = list_images(path)
+        return self.folders[path]
+
+    def folder(self, path, scale = 1, mode = 'auto'):
+        """Every image in a folder"""
+        surface_list = []
+        for full_path in self.listing(path):
+            try:
+                surface_list.append(self.get(full_path, scale, mode))
+            except pygame.error as e:
+                print(f"Error loading {full_path}: {e}")
+        return surface_list
+
+    def acquire(self, path, scale = 1, mode = 'auto'):
+        surf = self.get(path, scale, mode)
+        key = (path, scale, mode)
+        self.refs[key] = self.refs.get(key, 0) + 1
+        return surf
+
+    def acquire_folder(self, path, scale = 1, mode = 'auto'):
+        surface_list = self.folder(path, scale, mode)
+        for full_path in self.folders[path]:
+            key = (full_path, scale, mode)
+            if key in self.entries:
+                self.refs[key] = self.refs.get(key, 0) + 1
+        return surface_list
+
+    def release(self, path, scale = 1, mode = 'auto'):
+        key = (path, scale, mode)
+        if self.refs.get(key, 0) > 1:
+            self.refs[key] -= 1
+        else:
+            self.refs.pop(key, None)
+            self.evict()
+
+    def release_folder(self, path, scale = 1, mode = 'auto'):
+        for full_path in self.folders.get(path, ()):
+            self.release(full_path, scale, mode)
+
+    def evict(self):
+        if self.size <= self.budget:
+            return
+        for key in list(self.entries):
+            if key not in self.refs:
+                self.size -= surface_bytes(self.entries.pop(key))
+                if self.size <= self.budget:
+                    break
+
+
+class DecodeBatch:
+    """Images being decoded by a DecodePool.
+
+    wait() blocks until the workers are done, converts the results on the
+    calling (main) thread and stores them in the cache, after which the
+    usual load_image()/load_folder() calls are cache hits. collect() does
+    the same without blocking, for a few finished images at a time.
+    """
+    def __init__(self, cache, jobs, sheets):
+        self.cache = cache
+        self.jobs = jobs
+        self.sheets = sheets
+        self.total = len(jobs) + len(sheets)
+
+    @property
+    def progress(self):
+        """Share of the images the workers have finished decoding"""
+        if not self.total:
+            return 1.0
+        running = [future for _, future in self.jobs] + list(self.sheets.values())
+        return 1 - sum(not future.done() for future in running) / self.total
+
+    @property
+    def done(self):
+        return self.progress == 1.0
+
+    @property
+    def remaining(self):
+        """Images not yet converted into the cache"""
+        return len(self.jobs) + len(self.sheets)
+
+    def collect(self, limit = None):
+        """Convert up to limit finished images, returning how many are left"""
+        for sheet, future in list(self.sheets.items()):
+            if limit == 0:
+                return self.remaining
+            if future.done():
+                del self.sheets[sheet]
+                atlas = self.cache.atlas
+                if sheet not in atlas.sheets:
+                    atlas.sheets[sheet] = optimize_surface(future.result())
+                if limit is not None:
+                    limit -= 1
+
+        jobs = []
+        for key, future in self.jobs:
+            if limit == 0 or not future.done():
+                jobs.append((key, future))
+                continue
+            if limit is not None:
+                limit -= 1
+            if key in self.cache.entries:
+                continue
+            try:
+                self.cache.put(key, convert_image(future.result(), key[2]))
+            except (pygame.error, FileNotFoundError) as e:
+                #left for the loader that actually needs it to report
+                print(f"Error loading {key[0]}: {e}")
+        self.jobs = jobs
+        return self.remaining
+
+    def wait(self):
+        futures.wait([future for _, future in self.jobs] + list(self.sheets.values()))
+        self.collect()
+        return self
+
+
+class DecodePool:
+    """Decodes and scales images on worker threads ahead of their use.
+
+    Images that are already cached are skipped, and images packed in the
+    atlas queue their sheet instead, so every file is read at most once.
+    """
+    def __init__(self, cache, workers = DECODE_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self.executor = None
+
+    def submit(self, images = (), folders = (), mode = 'auto'):
+        """Start decoding (path, scale) images and (folder, scale) folders.
+
+        Callers preload what they are about to load and then load it as
+        usual: once the batch is waited on, those loads are cache hits.
+        """
+        if self.executor is None:
+            self.executor = futures.ThreadPoolExecutor(max_workers = self.workers, thread_name_prefix = 'decode')
+
+        items = list(images)
+        for folder, scale in folders:
+            items.extend((path, scale) for path in self.cache.listing(folder))
+
+        atlas = self.cache.atlas
+        jobs = []
+        sheets = {}
+        queued = set()
+        for path, scale in items:
+            key = (path, scale, mode)
+            if key in self.cache.entries or key in queued:
+                continue
+            queued.add(key)
+
+            sheet = atlas.sheet_of(path, scale) if mode == 'auto' else None
+            if sheet is None:
+                jobs.append((key, self.executor.submit(read_image, path, scale)))
+            elif sheet not in atlas.sheets and sheet not in sheets:
+                sheets[sheet] = self.executor.submit(read_image, atlas.sheet_path(sheet))
+        return DecodeBatch(self.cache, jobs, sheets)
+
+
+class FileAssets:
+    """Asset provider backed by the game's files (the default).
+
+    Images go through the shared AssetCache and DecodePool, fonts are read
+    from their ttf files.
+    """
+    def __init__(self, cache, pool):
+        self.cache = cache
+        self.pool = pool
+
+    def image(self, path, scale = 1):
+        return self.cache.get(path, scale)
+
+    def folder(self, path, scale = 1):
+        return self.cache.folder(path, scale)
+
+    def acquire(self, path, scale = 1):
+        return self.cache.acquire(path, scale)
+
+    def acquire_folder(self, path, scale = 1):
+        return self.cache.acquire_folder(path, scale)
+
+    def release(self, path, scale = 1):
+        self.cache.release(path, scale)
+
+    def release_folder(self, path, scale = 1):
+        self.cache.release_folder(path, scale)
+
+    def decode(self, path):
+        """An uncached image, for callers that manage their own memory"""
+        return decode_image(path)
+
+    def image_size(self, path):
+        return png_size(path)
+
+    def preload(self, images = (), folders = ()):
+        """Start decoding ahead of use, see DecodePool.submit()"""
+        return self.pool.submit(images, folders)
+
+    def font(self, path, size):
+        return pygame.font.Font(path, size)
+
+
+class StubAssets:
+    """Asset provider that hands out placeholders instead of decoding anything.
+
+    A placeholder has the size of the real image: taken from sizes, else from
+    the PNG header when the file exists, else default_size. Folders that do
+    not exist give frames placeholder frames. Meant for tests and headless
+    simulations, nothing needs a display or the image files.
+    """
+    def __init__(self, sizes = None, default_size = (64, 64), frames = 1, color = (255, 0, 255)):
+        self.sizes = sizes or {}
+        self.default_size = default_size
+        self.frames = frames
+        self.color = color
+        self.surfaces = {}
+
+    def image_size(self, path):
+        if path in self.sizes:
+            return self.sizes[path]
+        try:
+            return png_size(path)
+        except OSError:
+            return self.default_size
+
+    def image(self, path, scale = 1):
+        key = (path, scale)
+        if key not in self.surfaces:
+            width, height = self.image_size(path)
+            surf = pygame.Surface((int(width * scale), int(height * scale)))
+            surf.fill(self.color)
+            self.surfaces[key] = surf
+        return self.surfaces[key]
+
+    def folder(self, path, scale = 1):
+        paths = list_images(path) or [os.path.join(path, f'{i}.png') for i in range(self.frames)]
+        return [self.image(full_path, scale) for full_path in paths]
+
+    def acquire(self, path, scale = 1):
+        return self.image(path, scale)
+
+    def acquire_folder(self, path, scale = 1):
+        return self.folder(path, scale)
+
+    def release(self, path, scale = 1):
+        pass
+
+    def release_folder(self, path, scale = 1):
+        pass
+
+    def decode(self, path):
+        return self.image(path)
+
+    def preload(self, images = (), folders = ()):
+        return DecodeBatch(None, [], {})
+
+    def font(self, path, size):
+        if not pygame.font.get_init():
+            pygame.font.init()
+        return pygame.font.Font(None, size)
+
+
+cache = AssetCache()
+decode_pool = DecodePool(cache)
+active_assets = FileAssets(cache, decode_pool)
+
+def get_assets():
+    """The asset provider everything loads through"""
+    return active_assets
+
+def use_assets(assets):
+    """Switch the asset provider, returning the previous one"""
+    global active_assets
+    previous, active_assets = active_assets, assets
+    return previous
+
+def load_image(path, scale = 1):
+    """Load an image, resize it by scale and pick its blit format (cached)"""
+    return active_assets.image(path, scale)
+
+def load_folder(path, scale = 1):
+    return active_assets.folder(path, scale)
+
+
+class LazyImage:
+    """Handle for an image that is only loaded when get() is first called"""
+    def __init__(self, path, scale = 1):
+        self.path = path
+        self.scale = scale
+
+    def get(self):
+        return active_assets.image(self.path, self.scale)
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pygame
+from settings import sc
+from assets import ATLAS_DIR, list_images
+
+#largest sheet the packer will create
+ATLAS_SHEET_SIZE = 2048
+ATLAS_PADDING = 1
+
+def atlas_sources():
+    """(path, scale) of every frame the game loads one file at a time"""
+    sources = []
+
+    #player animations and plant stages are scaled by sc when loaded
+    for root in ('images/movement', 'images/soil'):
+        for folder in sorted(os.listdir(root)):
+            folder = os.path.join(root, folder)
+            if os.path.isdir(folder):
+                sources += [(path, sc) for path in list_images(folder)]
+
+    #soil tiles, overlay icons, buttons and the menu animation are used at their own size
+    sources += [(os.path.join('images/soil', name), 1)
+                for name in sorted(os.listdir('images/soil'))
+                if name.endswith('.png')]
+    for folder in ('images/overlay', 'images/buttons', 'images/bg_sitting'):
+        sources += [(path, 1) for path in list_images(folder)]
+    return sources
+
+def pack(sizes, sheet_size = ATLAS_SHEET_SIZE, padding = ATLAS_PADDING):
+    """Shelf-pack sizes, tallest first, returning (sheet, x, y) for each"""
+    places = [None] * len(sizes)
+    order = sorted(range(len(sizes)), key = lambda i: sizes[i][1], reverse = True)
+    sheet, x, y, shelf_height = 0, 0, 0, 0
+    for i in order:
+        width, height = sizes[i][0] + padding, sizes[i][1] + padding
+        if x + width > sheet_size:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if y + height > sheet_size:
+            sheet, x, y, shelf_height = sheet + 1, 0, 0, 0
+        places[i] = (sheet, x, y)
+        x += width
+        shelf_height = max(shelf_height, height)
+    return places
+
+def build_atlas(atlas_dir = ATLAS_DIR):
+    """Decode, scale and pack every source frame into sheets plus an index"""
+    frames = []
+    for path, scale in atlas_sources():
+        surf = pygame.image.load(path)
+        if scale != 1:
+            surf = pygame.transform.scale(surf, (int(surf.get_width() * scale), int(surf.get_height() * scale)))
+        frames.append((path, scale, surf))
+
+    places = pack([surf.get_size() for _, __, surf in frames])
+    sheet_count = max((sheet for sheet, _, __ in places), default = -1) + 1
+    bounds = [pygame.Rect(0, 0, 0, 0) for _ in range(sheet_count)]
+    for (sheet, x, y), (_, __, surf) in zip(places, frames):
+        bounds[sheet].union_ip(pygame.Rect(x, y, *surf.get_size()))
+
+    sheets = [pygame.Surface(rect.size, pygame.SRCALPHA) for rect in bounds]
+    index = {'sheets': [f'sheet_{i}.png' for i in range(sheet_count)], 'frames': []}
+    for (sheet, x, y), (path, scale, surf) in zip(places, frames):
+        sheets[sheet].blit(surf, (x, y))
+        index['frames'].append({'path': path, 'scale': scale, 'sheet': sheet,
+                                'rect': [x, y, surf.get_width(), surf.get_height()]})
+
+    os.makedirs(atlas_dir, exist_ok = True)
+    for name, sheet in zip(index['sheets'], sheets):
+        pygame.image.save(sheet, os.path.join(atlas_dir, name))
+    with open(os.path.join(atlas_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=4)
+    return index
+
+
+if __name__ == '__main__':
+    index = build_atlas()
+    print(f"Packed {len(index['frames'])} frames into {len(index['sheets'])} sheets in {ATLAS_DIR}")
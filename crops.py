@@ -0,0 +1,66 @@
+from array import array
+
+
+class CropTable:
+    """Growth state of every crop in parallel columns, one row per plant.
+
+    A day of growth is one pass over the columns. Whether a crop was
+    watered is read from the soil grid's flags for the whole grid at once
+    instead of asking it plant by plant. Only rows whose age changed are
+    written back to their sprite. The sprite redraws itself only when the
+    growth stage (the whole part of the age) changes.
+    """
+    def __init__(self):
+        self.cells = array('l')
+        self.ages = array('d')
+        self.speeds = array('d')
+        self.max_ages = array('d')
+        self.stages = array('l')
+        self.plants = []
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.plants)
+
+    def add(self, cell, plant):
+        """Track plant, cell is its index in the soil grid's cells"""
+        self.rows[cell] = len(self.plants)
+        self.cells.append(cell)
+        self.ages.append(plant.age)
+        self.speeds.append(plant.grow_speed)
+        self.max_ages.append(plant.max_age)
+        self.stages.append(int(plant.age))
+        self.plants.append(plant)
+
+    def remove(self, cell):
+        """Stop tracking the plant on cell, the last row takes its place"""
+        row = self.rows.pop(cell, None)
+        if row is None:
+            return
+        last = len(self.plants) - 1
+        if row != last:
+            for column in (self.cells, self.ages, self.speeds, self.max_ages, self.stages, self.plants):
+                column[row] = column[last]
+            self.rows[self.cells[row]] = row
+        for column in (self.cells, self.ages, self.speeds, self.max_ages, self.stages, self.plants):
+            del column[last]
+
+    def grow(self, watered):
+        """One day for every crop, watered holds a nonzero byte for each watered grid cell.
+
+        Returns the plants whose growth stage changed.
+        """
+        ages = array('d', [min(age + speed, max_age) if watered[cell] else age
+                           for cell, age, speed, max_age in zip(self.cells, self.ages, self.speeds, self.max_ages)])
+        grown = [row for row, (old, new) in enumerate(zip(self.ages, ages)) if old != new]
+        self.ages = ages
+
+        changed = []
+        for row in grown:
+            age = ages[row]
+            plant = self.plants[row]
+            plant.set_age(age)
+            if int(age) != self.stages[row]:
+                self.stages[row] = int(age)
+                changed.append(plant)
+        return changed
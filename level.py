@@ -7,187 +7,299 @@ from support import *
 from transition import Transition
 from soil import *
 from menu import Menu
+from world import WorldChunk, build_template
+from maps import MapManager, map_builders, register_map
+from weather import Rain
+from random import randint
+from render import RenderQueue, merge_rects, get_surface
+from assets import get_assets, surface_bytes
+from profiler import profiler
 import json
+from inspect import isgenerator
+
+def level_assets():
+    """(path, scale) images and (folder, scale) folders a new Level loads"""
+    images = [(image.path, image.scale) for image in scenery_images]
+    images += [('images/objects/apple.png', 1), ('images/soil/soil.png', 1), ('images/soil/soil_water.png', 1)]
+    folders = [('images/movement/' + animation, sc) for animation in Player.animation_names]
+    folders += [('images/layers/water', 1), ('images/overlay', 1), ('images/soil/carrot', sc), ('images/soil/tomato', sc)]
+    return images, folders
+
+def build_farm(game_map, player_add):
+    """The farm: scenery, colliders and water from the world template, then flowers and trees.
+
+    Yields between the parts, so a preloader can spread them over frames.
+    """
+    template = yield from build_template()
+    for surf, pos, z, collides in template.scenery:
+        Static(pos = pos,
+               surf = surf,
+               groups = [game_map.all_sprites, game_map.collision_sprites] if collides else game_map.all_sprites,
+               z = z)
+    yield
+
+    for rect in template.colliders:
+        Block(rect = rect, groups = game_map.collision_sprites)
+
+    Interaction(pos= (10 * TILE_SIZE, 8 * TILE_SIZE),
+                size= (TILE_SIZE, TILE_SIZE),
+                groups= game_map.interaction_sprites,
+                name= 'Enter')
+
+    # world
+    game_map.world_map = template.world_map
+    for name in template.world_map.chunks:
+        WorldChunk(name = name,
+                   world_map = template.world_map,
+                   groups = game_map.all_sprites)
+    game_map.all_sprites.set_world_size(template.size)
+    yield
+
+    #water
+    game_map.water = Water(pos = (0, 0),
+                           frames = (),
+                           groups = game_map.all_sprites,
+                           update_group = game_map.update_sprites,
+                           z = LAYERS['water'],
+                           cells = template.water_cells,
+                           frame_count = template.water_frame_count)
+    yield
+
+    #flowers
+    flower_image = flower_surf.get()
+    for x_tile, y_tile in flower_positions:
+        Flower(
+            pos=(x_tile * TILE_SIZE, y_tile * TILE_SIZE),
+            surf=flower_image,
+            groups=[game_map.all_sprites, game_map.collision_sprites, game_map.flower_sprites],
+            main_render_group=game_map.all_sprites,
+            player_add=player_add
+        )
+    yield
+
+    # trees
+    tree_image = tree_surf.get()
+    for x_tile, y_tile in tree_pos:
+        Tree(
+            pos=(x_tile * TILE_SIZE, y_tile * TILE_SIZE),
+            surf=tree_image,
+            groups=[game_map.all_sprites, game_map.collision_sprites, game_map.tree_sprites],
+            main_render_group=game_map.all_sprites,
+            player_add=player_add,
+            update_group=game_map.update_sprites
+        )
+
+register_map('farm', build_farm)
+
+
+class GameMap:
+    """One area of the game with its own sprites, colliders, soil and weather.
+
+    The builder registered under name fills it, a builder that is a
+    generator is run a part at a time through stages. snapshot() reduces it
+    to plain data (soil, plants and apples) and restore() puts that back on
+    a freshly built map, which is how the MapManager brings back evicted maps.
+    """
+    def __init__(self, name, player_add, stepwise = False):
+        self.name = name
+        self.all_sprites = CameraGroup()
+        self.update_sprites = UpdateGroup()
+        self.collision_sprites = pygame.sprite.Group()
+        self.tree_sprites = CellGroup()
+        self.flower_sprites = pygame.sprite.Group()
+        self.interaction_sprites = pygame.sprite.Group()
+        self.soil_layer = SoilLayer(
+            all_sprites=self.all_sprites,
+            tree_sprites=self.tree_sprites
+        )
+        self.rain = Rain(self.all_sprites, self.update_sprites)
+        self.world_map = None
+        self.water = None
+        self.stages = self.build(player_add)
+        if not stepwise:
+            for _ in self.stages:
+                pass
+
+    def build(self, player_add):
+        stages = map_builders[self.name](self, player_add)
+        if isgenerator(stages):
+            yield from stages
+
+    def memory(self):
+        """Rough resident size: the baked background, the soil canvases and a fixed cost per sprite"""
+        runs = self.all_sprites.render_queue.background.runs.values()
+        baked = sum(surface_bytes(surf) for _, chunks in runs for surf, _ in chunks)
+        return baked + self.soil_layer.memory() + len(self.all_sprites) * MAP_SPRITE_BYTES
+
+    def new_day(self):
+        for tree in self.tree_sprites:
+            tree.new_day()
+
+        self.soil_layer.update_plants()
+        self.soil_layer.remove_water()
+
+    def find_soil_at_pos(self, pos):
+        return self.soil_layer.soil_at(pos)
+
+    def release(self):
+        """Let go of the pinned assets, the map is about to be dropped"""
+        self.soil_layer.release_assets()
+
+    def snapshot(self):
+        return {
+            'soil_grid': self.soil_layer.grid.to_lists(),
+            'plants': [
+                {
+                    'pos': (plant.rect.x, plant.rect.y),
+                    'type': plant.plant_type,
+                    'age': plant.age
+                }
+                for plant in self.soil_layer.plant_sprites
+            ],
+            'trees': [
+                {
+                    'pos': tree.rect.topleft,
+                    'apples': sorted(tree.occupied_positions),
+                    'regrowth': tree.days_until_regrowth
+                }
+                for tree in self.tree_sprites
+            ]
+        }
+
+    def restore(self, state):
+        self.soil_layer.clear_plants()
+        self.soil_layer.load_grid(state['soil_grid'])
+
+        # Recreate plants
+        for plant_data in state['plants']:
+            if self.find_soil_at_pos(plant_data['pos']):
+                self.soil_layer.add_plant(*cell_of(plant_data['pos']), plant_data['type'], plant_data['age'])
+
+        trees = {tuple(tree_data['pos']): tree_data for tree_data in state.get('trees', [])}
+        for tree in self.tree_sprites:
+            tree_data = trees.get(tree.rect.topleft)
+            if tree_data:
+                tree.restore_apples(tree_data['apples'])
+                tree.days_until_regrowth = tree_data['regrowth']
+
 
 class Level:
     _instance = None
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self):
+    @classmethod
+    def discard(cls):
+        """Drop the current level, the next Level() is a new one built from the world template"""
+        if cls._instance is not None:
+            cls._instance.maps.clear()
+        cls._instance = None
+
+    def __init__(self, stepwise = False):
         if self._initialized:  # Prevent re-initialization
             return
 
+        #stepwise leaves running the stages to the caller (like the LevelPreloader)
+        self.stages = self.build()
+        if not stepwise:
+            for _ in self.stages:
+                pass
+
+    def build(self):
+        """Build the level a piece at a time, yielding between pieces"""
         #get the display surface
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = get_surface()
 
-        #sprites
-        self.all_sprites = CameraGroup()
-        self.collision_sprites = pygame.sprite.Group()
-        self.tree_sprites = pygame.sprite.Group()
-        self.flower_sprites = pygame.sprite.Group()
-        self.interaction_sprites = pygame.sprite.Group()
-        self.soil_layer = SoilLayer(
-            all_sprites=self.all_sprites,
-            tree_sprites=self.tree_sprites
-        )
+        #maps, the one the player is on is bound to the sprite groups below
+        self.maps = MapManager(self.build_map)
 
-        self.setup()
-        self.overlay = Overlay(self.player)
+        yield from self.setup()
+        with profiler.phase('overlay'):
+            self.overlay = Overlay(self.player)
         self.transition = Transition(self.reset, self.player)
 
+        #weather
+        with profiler.phase('weather'):
+            self.new_weather()
+        yield
+
         #menu
-        self.menu = Menu(self.player, self.menu_page)
+        with profiler.phase('menu'):
+            self.menu = Menu(self.player, self.menu_page)
         self.menu_active = False
 
-    def setup(self, destroyed_trees=None, destroyed_flowers=None):
+        #dirty rect rendering
+        self.overlaid = False
+        self.needs_full_redraw = True
 
-        #house
-        Generic(pos = (7 * TILE_SIZE - 12, 7 * TILE_SIZE - 270),
-                surf = house_surf.convert_alpha(),
-                groups = self.all_sprites,
-                z = LAYERS['main'])
-
-        #postbox
-        Generic(pos = (12 * TILE_SIZE, 6 * TILE_SIZE + 15),
-                surf = s_post_surf.convert_alpha(),
-                groups = self.all_sprites,
-                z = LAYERS['shadow'])
-
-        Generic(pos=(12 * TILE_SIZE, 6 * TILE_SIZE + 15),
-                surf=post_surf.convert_alpha(),
-                groups=[self.all_sprites, self.collision_sprites],
-                z=LAYERS['main'])
-
-        #fence
-        Generic(pos=(6 * TILE_SIZE + 9, 6 * TILE_SIZE - 24),
-                surf=s_fence_surf.convert_alpha(),
-                groups = self.all_sprites,
-                z = LAYERS['shadow'])
-
-        Generic(pos=(6 * TILE_SIZE + 12, 6 * TILE_SIZE - 24),
-                surf=fence1_surf.convert_alpha(),
-                groups=[self.all_sprites, self.collision_sprites],
-                z=LAYERS['main'])
-
-        Generic(pos=(7 * TILE_SIZE - 12, 9 * TILE_SIZE - 33),
-                surf=fence2_surf.convert_alpha(),
-                groups=[self.all_sprites, self.collision_sprites],
-                z=LAYERS['main'])
-
-        #path
-        Generic(pos = (10 * TILE_SIZE - 9, 8 * TILE_SIZE),
-                surf = path_surf.convert_alpha(),
-                groups = self.all_sprites,
-                z = LAYERS['soil'])
-
-        #bridge
-        Generic(pos = (0 * TILE_SIZE, 5 * TILE_SIZE + 18),
-                surf = s_bridge_surf.convert_alpha(),
-                groups = self.all_sprites,
-                z = LAYERS['shadow'])
-
-        Generic(pos=(0 * TILE_SIZE, 2 * TILE_SIZE - 9),
-                surf=bridge_surf3.convert_alpha(),
-                groups=self.all_sprites,
-                z=LAYERS['main'])
-
-        Generic(pos=(0 * TILE_SIZE, 3 * TILE_SIZE),
-                surf=bridge_surf1.convert_alpha(),
-                groups=self.all_sprites,
-                z=LAYERS['soil'])
-
-        Generic(pos=(0 * TILE_SIZE, 4 * TILE_SIZE + 6),
-                surf=bridge_surf2.convert_alpha(),
-                groups=self.all_sprites,
-                z=LAYERS['main'])
-
-        #collision tiles
-        for x_tile, y_tile in collision_pos:
-            Block(pos=(x_tile * TILE_SIZE, y_tile * TILE_SIZE),
-                surf=pygame.Surface((TILE_SIZE, TILE_SIZE)),
-                groups = self.collision_sprites)
-
-        Block(
-            pos=(12 * TILE_SIZE + 12, 7 * TILE_SIZE - 18),
-            surf=pygame.Surface((36, 18)),
-            groups = self.collision_sprites
-        )
-
-        Block(
-            pos=(6 * TILE_SIZE + 3, 9 * TILE_SIZE - 30),
-            surf=pygame.Surface((138, 21)),
-            groups = self.collision_sprites
-        )
-
-        Block(
-            pos=(6 * TILE_SIZE + 3, 6 * TILE_SIZE - 33),
-            surf=pygame.Surface((38, 144)),
-            groups = self.collision_sprites
-        )
-
-        for x_tile, y_tile in border1:
-            Block(pos=(x_tile * TILE_SIZE, y_tile * TILE_SIZE),
-                surf=pygame.Surface((TILE_SIZE, 30)),
-                groups = self.collision_sprites)
+    def setup(self, destroyed_trees=None, destroyed_flowers=None):
+        with profiler.phase('decode batch'):
+            get_assets().preload(*level_assets()).wait()
+        yield
 
-        for x_tile, y_tile in border2:
-            Block(pos=(x_tile * TILE_SIZE + 21, y_tile * TILE_SIZE),
-                surf=pygame.Surface((TILE_SIZE, TILE_SIZE)),
-                groups = self.collision_sprites)
+        farm = GameMap('farm', self.player_add, stepwise = True)
+        yield from profiler.steps('farm', farm.stages)
+        self.bind_map(self.maps.add('farm', farm))
+        yield
 
         # player
         self.player = Player(pos = (429, 291),
-                             group = self.all_sprites,
+                             group = [self.all_sprites, self.update_sprites],
                              collision_sprites=self.collision_sprites,
                              tree_sprites = self.tree_sprites,
                              interaction = self.interaction_sprites,
                              soil_layer = self.soil_layer,
                              menu_page=self.menu_page
                              )
-        Interaction(pos= (10 * TILE_SIZE, 8 * TILE_SIZE),
-                    size= (TILE_SIZE, TILE_SIZE),
-                    groups= self.interaction_sprites,
-                    name= 'Enter')
-
-        # world
-        Generic(pos=(0, 0),
-                surf=pygame.image.load('images/layers/world.png').convert_alpha(),
-                groups=self.all_sprites,
-                z=LAYERS['ground'])
-
-        #water
-        water_frames = import_folder_without_sc('images/layers/water')
-        Water(pos = (0, 0),
-              frames = water_frames,
-              groups = self.all_sprites,
-              z = LAYERS['water'])
-
-        #flowers
-        for x_tile, y_tile in flower_positions:
-            Flower(
-                pos=(x_tile * TILE_SIZE, y_tile * TILE_SIZE),
-                surf=flower_surf.convert_alpha(),
-                groups=[self.all_sprites, self.collision_sprites, self.flower_sprites],
-                main_render_group=self.all_sprites,
-                player_add=self.player_add
-            )
-
-            # trees - only create if not destroyed
-        for x_tile, y_tile in tree_pos:
-            Tree(
-                pos=(x_tile * TILE_SIZE, y_tile * TILE_SIZE),
-                surf=tree_surf.convert_alpha(),
-                groups=[self.all_sprites, self.collision_sprites, self.tree_sprites],
-                main_render_group=self.all_sprites,
-                player_add=self.player_add
-            )
+        self.soil_layer.preload_plants(self.player.seeds)
+        yield
+
+    def build_map(self, name):
+        #maps rebuilt after an eviction pin the seed frames again, like the first farm
+        game_map = GameMap(name, self.player_add)
+        game_map.soil_layer.preload_plants(self.player.seeds)
+        return game_map
+
+    def bind_map(self, game_map):
+        """Point the level's groups and layers at the map the player is on"""
+        self.map = game_map
+        self.all_sprites = game_map.all_sprites
+        self.update_sprites = game_map.update_sprites
+        self.collision_sprites = game_map.collision_sprites
+        self.tree_sprites = game_map.tree_sprites
+        self.flower_sprites = game_map.flower_sprites
+        self.interaction_sprites = game_map.interaction_sprites
+        self.soil_layer = game_map.soil_layer
+        self.rain = game_map.rain
+        self.world_map = game_map.world_map
+        self.water = game_map.water
+
+    def enter_map(self, name, pos = None):
+        """Take the player to another map, resident maps are switched to without a setup"""
+        raining = self.rain.raining
+        self.player.kill()
+        self.bind_map(self.maps.get(name))
+
+        self.player.add(self.all_sprites, self.update_sprites)
+        self.player.collision_sprites = self.collision_sprites
+        self.player.tree_sprites = self.tree_sprites
+        self.player.interaction = self.interaction_sprites
+        self.player.soil_layer = self.soil_layer
+        if pos:
+            self.player.rect.topleft = pos
+            self.player.hitbox.center = self.player.rect.center
+            self.player.pos = pygame.math.Vector2(self.player.rect.center)
+
+        self.rain.raining = raining
+        self.soil_layer.raining = raining
+        self.needs_full_redraw = True
 
     def save_game(self, save_file = 'save.json'):
+        farm = self.maps.state('farm')
         save_data = {
             'player': {
                 'pos': (self.player.rect.x, self.player.rect.y),
@@ -195,15 +307,8 @@ class Level:
                 'selected_tool': self.player.selected_tool,
                 'selected_seed': self.player.selected_seed
             },
-            'soil_grid': self.soil_layer.grid,
-            'plants': [
-                {
-                    'pos': (plant.rect.x, plant.rect.y),
-                    'type': plant.plant_type,
-                    'age': plant.age
-                }
-                for plant in self.soil_layer.plant_sprites
-            ]
+            'soil_grid': farm['soil_grid'],
+            'plants': farm['plants']
         }
         with open(save_file, 'w') as f:
             json.dump(save_data, f, indent=4)
@@ -219,32 +324,14 @@ class Level:
             self.player.selected_tool = save_data['player']['selected_tool']
             self.player.selected_seed = save_data['player']['selected_seed']
 
-            # Reset world first
-            self.soil_layer.grid = save_data['soil_grid']
-            self.soil_layer.create_soil_tiles()
-
-            # Recreate plants
-            self.soil_layer.plant_sprites.empty()
-            for plant_data in save_data['plants']:
-                soil_sprite = self.find_soil_at_pos(plant_data['pos'])
-                if soil_sprite:
-                    plant = Plant(
-                        plant_type=plant_data['type'],
-                        groups=[self.all_sprites, self.soil_layer.plant_sprites],
-                        soil=soil_sprite,
-                        check_watered=self.soil_layer.check_watered
-                    )
-                    plant.age = plant_data['age']
-
+            # Soil and plants
+            self.maps.get('farm').restore(save_data)
             return True
         except (FileNotFoundError, json.JSONDecodeError):
             return False  # No save file found
 
     def find_soil_at_pos(self, pos):
-        for sprite in self.soil_layer.soil_sprites:
-            if sprite.rect.collidepoint(pos):
-                return sprite
-        return None
+        return self.map.find_soil_at_pos(pos)
 
     def player_add(self, item):
 
@@ -255,69 +342,244 @@ class Level:
         self.menu_active = not self.menu_active
         #print(f"Menu Active: {self.menu_active}")
 
+    def new_weather(self):
+        self.rain.raining = randint(0, 10) > 7
+        self.soil_layer.raining = self.rain.raining
+        if self.rain.raining:
+            self.soil_layer.water_all()
+
     def reset(self):
         self.save_game()
-        # apples
-        for tree in self.tree_sprites:
-            tree.new_day()
-
-        self.soil_layer.update_plants()
-        self.soil_layer.remove_water()
+        #apples and plants, on every map that is built (evicted ones wait)
+        for game_map in self.maps.resident.values():
+            game_map.new_day()
+        self.new_weather()
 
     def plant_collision(self):
-        if self.soil_layer.plant_sprites:
-            for plant in self.soil_layer.plant_sprites.sprites():
-                if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
-                    self.player_add(plant.plant_type)
-                    plant.kill()
-                    Particle(pos=plant.rect.topleft,
-                             surf=plant.image,
-                             groups=self.all_sprites,
-                             z=LAYERS['main'])
-                    self.soil_layer.grid[int(plant.rect.centery // TILE_SIZE)][int(plant.rect.centerx // TILE_SIZE)].remove('P')
+        for plant in self.soil_layer.plants_touching(self.player.hitbox):
+            if plant.harvestable:
+                self.player_add(plant.plant_type)
+                self.soil_layer.remove_plant(*cell_of(plant.rect.topleft))
+                Particle(pos=plant.rect.topleft,
+                         surf=plant.image,
+                         groups=[self.all_sprites, self.update_sprites],
+                         z=LAYERS['main'])
+
+    def invalidate(self):
+        """Something was drawn over the level, so the next frame is redrawn whole"""
+        self.overlaid = True
 
     def run(self, dt):
+        """Update and draw one frame.
+
+        Returns the screen rects that changed, None when the whole screen did.
+        """
+        overlaid = self.overlaid or self.menu_active or self.player.sleep
+        dirty = DIRTY_RECTS and not overlaid and not self.needs_full_redraw
+        self.overlaid = False
 
         #drawing logic
-        self.display_surface.fill('black')
-        self.all_sprites.custom_draw(self.player)
+        rects = self.all_sprites.custom_draw(self.player, dirty, self.overlay.rects())
+        if rects is not None:
+            rects = merge_rects(rects + self.overlay.dirty_rects())
 
         if self.menu_active:
             self.menu.update()
         else:
-            self.all_sprites.update(dt)
+            #only registered sprites are ticked, static ones cost nothing
+            self.update_sprites.update(dt)
             self.plant_collision()
 
-        self.overlay.display()
+        if rects is None:
+            self.overlay.display()
+        else:
+            for rect in rects:
+                self.display_surface.set_clip(rect)
+                self.overlay.display()
+            self.display_surface.set_clip(None)
 
         if self.player.sleep:
             self.transition.play()
 
-        #print(self.menu_active)
-        #print(self.player.item_inventory)
+        #after a menu or transition frame the whole screen has to be redrawn
+        self.needs_full_redraw = overlaid or self.menu_active or self.player.sleep
+        return rects
 
-class CameraGroup(pygame.sprite.Group):
+class UpdateGroup(pygame.sprite.Group):
+    """The sprites that have something to do each tick.
+
+    A sprite with an update_interval is ticked at most that often, with the
+    time that passed since its last tick.
+    """
     def __init__(self):
         super().__init__()
-        self.display_surface = pygame.display.get_surface()
-        self.offset = pygame.math.Vector2()
+        self.elapsed = {}
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.elapsed.pop(sprite, None)
+
+    def update(self, dt):
+        for sprite in self.sprites():
+            interval = getattr(sprite, 'update_interval', 0)
+            if not interval:
+                sprite.update(dt)
+                continue
+
+            elapsed = self.elapsed.get(sprite, 0) + dt
+            if elapsed < interval:
+                self.elapsed[sprite] = elapsed
+            else:
+                self.elapsed[sprite] = 0
+                sprite.update(elapsed)
 
-    def custom_draw(self, player):
-        self.offset.x = player.rect.centerx# - SCREEN_WIDTH / 2
-        self.offset.y = player.rect.centery# - SCREEN_HEIGHT / 2
-
-        for layer in LAYERS.values():
-            for sprite in sorted(self.sprites(), key = lambda sprite: sprite.rect.bottom):
-                if sprite.z == layer:
-                    offset_rect = sprite.rect.copy()
-                    #offset_rect.center -= self.offset
-                    self.display_surface.blit(sprite.image, offset_rect)
-
-                    #to check
-                    #if sprite == player:
-                        #pygame.draw.rect(self.display_surface, 'red', offset_rect, 5)
-                        #hitbox_rect = player.hitbox.copy()
-                        #hitbox_rect.center = offset_rect.center
-                        #pygame.draw.rect(self.display_surface, 'green', hitbox_rect, 5)
-                        #target_pos = offset_rect.center + player_tool_offset[player.status.split('_')[0]]
-                        #pygame.draw.circle(self.display_surface, 'blue', target_pos, 5)
\ No newline at end of file
+class CameraGroup(pygame.sprite.Group):
+    def __init__(self, margin = CAMERA_MARGIN):
+        self.render_queue = RenderQueue()
+        super().__init__()
+        self.display_surface = get_surface()
+        self.offset = pygame.math.Vector2()
+        self.margin = margin
+        self.world_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.viewport = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+        #dirty rect tracking
+        self.last_drawn = None
+        self.last_viewport = None
+        self.last_version = None
+        self.scrolled = False
+        self.invalid_rects = []
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.render_queue.add(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.render_queue.remove(sprite)
+
+    def add_renderer(self, layer, renderer):
+        self.render_queue.add_renderer(layer, renderer)
+
+    def set_world_size(self, size):
+        """The camera never scrolls past the edges of the world"""
+        self.world_rect = pygame.Rect((0, 0), size)
+
+    def follow(self, player):
+        width, height = self.display_surface.get_size()
+        x = player.rect.centerx - width // 2
+        y = player.rect.centery - height // 2
+
+        #clamp to the world, a world smaller than the screen stays at the origin
+        x = max(0, min(x, self.world_rect.width - width))
+        y = max(0, min(y, self.world_rect.height - height))
+
+        self.offset.update(x, y)
+        self.viewport.update(x, y, width, height)
+
+    def invalidate(self, rect):
+        """Redraw a world-space region whose sprites changed in place"""
+        self.invalid_rects.append(pygame.Rect(rect))
+
+    def dirty_rects(self, fixed_rects = ()):
+        """Screen rects that changed since the last frame, None if all of it did.
+
+        When the camera moved by less than a screen, the last frame is
+        scrolled along and only the strips it uncovered, the sprites that
+        changed and fixed_rects (drawn over the world at the same screen
+        spot every frame, like the HUD) are redrawn. scrolled is then set,
+        as every pixel still has to be presented. Active weather covers
+        the whole screen, so it always gets a full redraw.
+        """
+        drawn = self.render_queue.snapshot(self.viewport.topleft, self.viewport)
+        last_drawn, self.last_drawn = self.last_drawn, drawn
+        last_viewport, self.last_viewport = self.last_viewport, self.viewport.copy()
+        invalid_rects, self.invalid_rects = self.invalid_rects, []
+        self.scrolled = False
+
+        version = self.render_queue.background.version
+        last_version, self.last_version = self.last_version, version
+        if last_drawn is None or version != last_version or self.render_queue.animating:
+            return None
+
+        width, height = self.viewport.size
+        dx = self.viewport.x - last_viewport.x
+        dy = self.viewport.y - last_viewport.y
+        if abs(dx) >= width or abs(dy) >= height:
+            return None
+
+        rects = [rect.move(-self.viewport.x, -self.viewport.y) for rect in invalid_rects]
+        if dx or dy:
+            self.scrolled = True
+            self.display_surface.scroll(-dx, -dy)
+            if dx:
+                rects.append(pygame.Rect(width - dx if dx > 0 else 0, 0, abs(dx), height))
+            if dy:
+                rects.append(pygame.Rect(0, height - dy if dy > 0 else 0, width, abs(dy)))
+            for rect in fixed_rects:
+                rects.append(rect.move(-dx, -dy))
+                rects.append(rect)
+
+        for sprite, (image, rect) in drawn.items():
+            last = last_drawn.pop(sprite, None)
+            if last is None:
+                rects.append(rect)
+            elif last[0] is not image or last[1].move(-dx, -dy) != rect:
+                rects.append(last[1].move(-dx, -dy))
+                rects.append(rect)
+
+        #sprites that were killed or left the screen
+        rects.extend(rect.move(-dx, -dy) for image, rect in last_drawn.values())
+        screen_rect = self.display_surface.get_rect()
+        return [rect for rect in merge_rects(rects) if rect.colliderect(screen_rect)]
+
+    def prepare(self, player):
+        """Sort, bake and decode what the first frame around player needs"""
+        for _ in self.preparing(player):
+            pass
+
+    def preparing(self, player):
+        """prepare() that yields after each baked background chunk"""
+        self.follow(player)
+        yield from self.render_queue.refreshing()
+        area = self.viewport.inflate(self.margin * 2, self.margin * 2)
+        for layer in self.render_queue.layers:
+            for sprite in self.render_queue.visible(layer, area):
+                sprite.image
+
+    def custom_draw(self, player, dirty = False, fixed_rects = ()):
+        """Draw the world, or with dirty only the regions that changed.
+
+        Returns the screen rects that have to be presented, None when the
+        whole screen was redrawn.
+        """
+        self.follow(player)
+
+        #only sprites that moved or changed layer get re-sorted
+        self.render_queue.refresh()
+
+        if dirty:
+            rects = self.dirty_rects(fixed_rects)
+        else:
+            #the next dirty frame has nothing to compare against, and this one redraws what changed
+            rects = self.last_drawn = None
+            self.invalid_rects.clear()
+        if rects is None:
+            self.display_surface.fill('black')
+
+            #only sprites touching the viewport (plus margin) get blitted
+            area = self.viewport.inflate(self.margin * 2, self.margin * 2)
+            self.render_queue.draw(self.display_surface, self.viewport.topleft, area)
+            return None
+
+        for rect in rects:
+            self.display_surface.set_clip(rect)
+            self.display_surface.fill('black')
+            area = rect.move(self.viewport.topleft)
+            self.render_queue.draw(self.display_surface, self.viewport.topleft, area)
+        self.display_surface.set_clip(None)
+
+        #a scrolled frame moved every pixel, even though few were redrawn
+        if self.scrolled:
+            return [self.display_surface.get_rect()]
+        return rects
@@ -3,6 +3,10 @@ from settings import *
 from button import Button
 from abc import ABC, abstractmethod
 from level import Level
+from preload import LevelPreloader
+from render import RenderTarget
+from assets import load_image, get_assets
+from profiler import profiler
 
 
 class RenderStrategy(ABC):
@@ -48,16 +52,30 @@ class TitleRenderStrategy(RenderStrategy):
         game.screen.blit(game.title_image, game.title_rect)
 
 
+class PreloadProgressStrategy(RenderStrategy):
+    def draw(self, game, dt):
+        if not game.preloader.done:
+            width = int(SCREEN_WIDTH * game.preloader.progress)
+            pygame.draw.rect(game.screen, (255, 255, 255), (0, SCREEN_HEIGHT - 4, width, 4))
+
+
 class Game:
     def __init__(self):
-        pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("One Summer's Day")
-        pygame.display.set_icon(pygame.image.load('images/icon.png'))
+        with profiler.phase('display'):
+            pygame.init()
+            self.render_target = RenderTarget((WINDOW_WIDTH, WINDOW_HEIGHT))
+            self.screen = self.render_target.surface
+            pygame.display.set_caption("One Summer's Day")
+            pygame.display.set_icon(pygame.image.load('images/icon.png'))
         self.clock = pygame.time.Clock()
 
         # Load resources
-        self.load_resources()
+        with profiler.phase('menu resources'):
+            self.load_resources()
+
+        # Build the level in the background while the menu plays
+        with profiler.phase('preloader'):
+            self.preloader = LevelPreloader()
 
         # State management
         self.init_state_system()
@@ -73,14 +91,14 @@ class Game:
         self.pause_buttons = {
             'resume': Button(
                 SCREEN_WIDTH//2 - 150, SCREEN_HEIGHT//2 - 60,
-                pygame.image.load('images/buttons/resume.png'),
-                pygame.image.load('images/buttons/resume_light.png'),
+                load_image('images/buttons/resume.png'),
+                load_image('images/buttons/resume_light.png'),
                 1
             ),
             'save_quit': Button(
                 SCREEN_WIDTH//2 - 150, SCREEN_HEIGHT//2 + 70,
-                pygame.image.load('images/buttons/save_quit.png'),
-                pygame.image.load('images/buttons/save_quit_light.png'),
+                load_image('images/buttons/save_quit.png'),
+                load_image('images/buttons/save_quit_light.png'),
                 1
             )
         }
@@ -89,26 +107,29 @@ class Game:
 
     def load_resources(self):
         """Load all game assets"""
-        self.bg = pygame.image.load('images/bg_1.png')
-        self.bg1 = pygame.image.load('images/nm2.png')
+        with profiler.phase('decode batch'):
+            get_assets().preload([('images/bg_1.png', 1), ('images/nm2.png', 1), ('images/title1.png', 1.7)]
+                                 + [(f'images/bg_sitting/{i}.png', 1) for i in range(1, 16)]
+                                 + [(f'images/buttons/{name}{light}.png', 1)
+                                    for name in ('new', 'load', 'exit', 'resume', 'save_quit')
+                                    for light in ('', '_light')]).wait()
+
+        self.bg = load_image('images/bg_1.png')
+        self.bg1 = load_image('images/nm2.png')
         self.bg_x = 0
 
         # Load animation frames
         self.main_anim = []
         for i in range(1, 16):
             try:
-                frame = pygame.image.load(f'images/bg_sitting/{i}.png')
+                frame = load_image(f'images/bg_sitting/{i}.png')
                 self.main_anim.append(frame)
             except:
                 print(f"Warning: Missing animation frame {i}")
         self.anim_index = 0
 
         # Title setup
-        title_img = pygame.image.load('images/title1.png')
-        self.title_image = pygame.transform.scale(
-            title_img,
-            (int(title_img.get_width() * 1.7), int(title_img.get_height() * 1.7))
-        )
+        self.title_image = load_image('images/title1.png', 1.7)
         self.title_rect = self.title_image.get_rect(center=(SCREEN_WIDTH / 2, 230))
 
         # Buttons
@@ -120,8 +141,8 @@ class Game:
         """Helper to create consistent buttons"""
         return Button(
             SCREEN_WIDTH / 2 - 90, y,
-            pygame.image.load(f'images/buttons/{name}.png'),
-            pygame.image.load(f'images/buttons/{name}_light.png'),
+            load_image(f'images/buttons/{name}.png'),
+            load_image(f'images/buttons/{name}_light.png'),
             0.9
         )
 
@@ -144,24 +165,28 @@ class Game:
         self.render_strategies = {
             'scrolling_bg': ScrollingBGStrategy(),
             'menu_anim': MenuAnimationStrategy(),
-            'title': TitleRenderStrategy()
+            'title': TitleRenderStrategy(),
+            'preload': PreloadProgressStrategy()
         }
 
         # Composite strategies for different game states
         self.state_renderers = {
             self.STATES['INTRO']: CompositeRenderStrategy([
                 self.render_strategies['scrolling_bg'],
-                self.render_strategies['menu_anim']
+                self.render_strategies['menu_anim'],
+                self.render_strategies['preload']
             ]),
             self.STATES['TITLE']: CompositeRenderStrategy([
                 self.render_strategies['scrolling_bg'],
                 self.render_strategies['menu_anim'],
-                self.render_strategies['title']
+                self.render_strategies['title'],
+                self.render_strategies['preload']
             ]),
             self.STATES['BUTTONS']: CompositeRenderStrategy([
                 self.render_strategies['scrolling_bg'],
                 self.render_strategies['menu_anim'],
-                self.render_strategies['title']
+                self.render_strategies['title'],
+                self.render_strategies['preload']
             ]),
             self.STATES['PLAYING']: CompositeRenderStrategy([])
         }
@@ -223,6 +248,10 @@ class Game:
         self.visible_buttons = set()
         pygame.mixer.music.unpause()
 
+        # The next game gets a fresh level, cheaply rebuilt from the world template
+        Level.discard()
+        self.preloader = LevelPreloader()
+
     def update_state(self):
         """Update game state based on timing"""
         elapsed = pygame.time.get_ticks() - self.start_time
@@ -240,9 +269,17 @@ class Game:
             if elapsed > self.button_timings['quit']:
                 self.visible_buttons.add('quit')
 
+        # Keep building the level while the menu is idle
+        if self.state != self.STATES['PLAYING']:
+            self.preloader.step()
+
     def render_frame(self, dt):
         """Render complete game frame"""
-        self.screen.fill((0, 0, 0))  # Clear screen
+        dirty_rects = None
+
+        # The level clears what it redraws itself
+        if self.state != self.STATES['PLAYING']:
+            self.screen.fill((0, 0, 0))  # Clear screen
 
         # Draw background elements based on state
         self.state_renderers[self.state].draw(self, dt)
@@ -253,13 +290,18 @@ class Game:
 
         # Draw game level if playing
         if self.state == self.STATES['PLAYING']:
-            self.level.run(dt)
+            # Pause menu is drawn over the level, so it must redraw in full
+            if self.pause_menu_active:
+                self.level.invalidate()
+
+            dirty_rects = self.level.run(dt)
 
             # Draw pause menu on top if active
             if self.pause_menu_active:
                 self.draw_pause_menu()
 
-        pygame.display.update()
+        # Only present what changed when the level tracked dirty rects
+        self.render_target.present(dirty_rects)
 
     def draw_pause_menu(self):
         """Draw the pause menu overlay"""
@@ -288,13 +330,17 @@ class Game:
     def start_game(self):
         """Transition to gameplay state"""
         self.state = self.STATES['PLAYING']
-        self.level = Level()
+        with profiler.phase('start game'):
+            self.level = self.preloader.finish()
+        profiler.finish()
 
     def load_game(self):
         """Load saved game"""
         self.state = self.STATES['PLAYING']
-        self.level = Level()
-        self.level.load_game()
+        with profiler.phase('load game'):
+            self.level = self.preloader.finish()
+            self.level.load_game()
+        profiler.finish()
 
     def quit_game(self):
         """Cleanup and exit"""
@@ -305,5 +351,7 @@ class Game:
 
 
 if __name__ == '__main__':
+    if '--profile-startup' in sys.argv:
+        profiler.enabled = True
     game = Game()
     game.run()
\ No newline at end of file
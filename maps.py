@@ -0,0 +1,71 @@
+import json
+from collections import OrderedDict
+from settings import *
+
+#builder(game_map, player_add) for every map the player can go to
+map_builders = {}
+
+def register_map(name, builder):
+    """Make a map available under name, builder fills an empty GameMap with its sprites
+
+    A builder may be a generator that yields between parts of the map.
+    """
+    map_builders[name] = builder
+
+
+class MapManager:
+    """Keeps recently visited maps built, the least recently used go first.
+
+    Once more than capacity maps are resident, or together they use more
+    than budget bytes, the coldest ones (never the map just asked for) are
+    reduced to their serialized state and dropped. Asking for such a map
+    builds it again from its template and restores that state.
+    """
+    def __init__(self, build, capacity = MAP_CACHE_SIZE, budget = MAP_CACHE_BUDGET):
+        self.build = build
+        self.capacity = capacity
+        self.budget = budget
+        self.resident = OrderedDict()
+        self.cold = {}
+
+    def get(self, name):
+        if name in self.resident:
+            self.resident.move_to_end(name)
+        else:
+            game_map = self.build(name)
+            if name in self.cold:
+                game_map.restore(json.loads(self.cold.pop(name)))
+            self.resident[name] = game_map
+        self.evict()
+        return self.resident[name]
+
+    def add(self, name, game_map):
+        """Make a map built elsewhere resident"""
+        self.resident[name] = game_map
+        self.resident.move_to_end(name)
+        self.evict()
+        return game_map
+
+    def state(self, name):
+        """Serializable state of a map, resident or not (None if never built)"""
+        if name in self.resident:
+            return self.resident[name].snapshot()
+        if name in self.cold:
+            return json.loads(self.cold[name])
+        return None
+
+    def memory(self):
+        return sum(game_map.memory() for game_map in self.resident.values())
+
+    def evict(self):
+        while len(self.resident) > 1 and (len(self.resident) > self.capacity or self.memory() > self.budget):
+            name, game_map = self.resident.popitem(last = False)
+            self.cold[name] = json.dumps(game_map.snapshot())
+            game_map.release()
+
+    def clear(self):
+        """Drop every map for good, releasing their assets"""
+        for game_map in self.resident.values():
+            game_map.release()
+        self.resident.clear()
+        self.cold.clear()
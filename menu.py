@@ -1,6 +1,8 @@
 import pygame
 from settings import *
 from timer import Timer
+from render import get_surface
+from assets import get_assets
 
 class Menu:
     def __init__(self, player, toggle_menu):
@@ -8,8 +10,8 @@ class Menu:
         #setup
         self.player = player
         self.toggle_menu = toggle_menu
-        self.display_surface = pygame.display.get_surface()
-        self.font = pygame.font.Font('font/Micro_5/Micro5-Regular.ttf', 50)
+        self.display_surface = get_surface()
+        self.font = get_assets().font('font/Micro_5/Micro5-Regular.ttf', 50)
 
         #options
         self.width = 400
@@ -1,31 +1,52 @@
 import pygame
 from settings import *
+from render import get_surface
+from assets import load_image
 
 class Overlay:
     def __init__(self, player):
 
         #gen setup
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = get_surface()
         self.player = player
 
         #imports
         overlay_path = 'images/overlay/'
-        self.tools_surf = {tool: pygame.image.load(f'{overlay_path}{tool}.png').convert_alpha() for tool in player.tools}
-        self.seeds_surf = {seed: pygame.image.load(f'{overlay_path}{seed}.png').convert_alpha() for seed in player.seeds}
+        self.tools_surf = {tool: self.scaled(load_image(f'{overlay_path}{tool}.png'), 'tool') for tool in player.tools}
+        self.seeds_surf = {seed: self.scaled(load_image(f'{overlay_path}{seed}.png'), 'seed') for seed in player.seeds}
+
+        #what was shown last, for dirty rect rendering
+        self.shown = None
+
+    def scaled(self, surf, slot):
+        """Icon scaled once up front, placed where the full size icon would sit"""
+        rect = surf.get_rect(midbottom = OVERLAY_POSITIONS[slot])
+        new_width = int(surf.get_width() * 0.8)
+        new_height = int(surf.get_height() * 0.8)
+        surf = pygame.transform.scale(surf, (new_width, new_height))
+        return surf, surf.get_rect(topleft = rect.topleft)
+
+    def rects(self):
+        """Screen rects of the icons shown right now"""
+        return [self.tools_surf[self.player.selected_tool][1], self.seeds_surf[self.player.selected_seed][1]]
+
+    def dirty_rects(self):
+        """Icon rects that need redrawing because the selection changed"""
+        shown = (self.player.selected_tool, self.player.selected_seed)
+        if shown == self.shown:
+            return []
+        rects = []
+        if self.shown:
+            rects += [self.tools_surf[self.shown[0]][1], self.seeds_surf[self.shown[1]][1]]
+        rects += [self.tools_surf[shown[0]][1], self.seeds_surf[shown[1]][1]]
+        self.shown = shown
+        return rects
 
     def display(self):
         # tools
-        tool_surf = self.tools_surf[self.player.selected_tool]
-        tool_rect = tool_surf.get_rect(midbottom = OVERLAY_POSITIONS['tool'])
-        new_width = int(tool_surf.get_width() * 0.8)
-        new_height = int(tool_surf.get_height() * 0.8)
-        tool_surf = pygame.transform.scale(tool_surf, (new_width, new_height))
+        tool_surf, tool_rect = self.tools_surf[self.player.selected_tool]
         self.display_surface.blit(tool_surf, tool_rect)
 
         #seeds
-        seed_surf = self.seeds_surf[self.player.selected_seed]
-        seed_rect = seed_surf.get_rect(midbottom=OVERLAY_POSITIONS['seed'])
-        new_width = int(seed_surf.get_width() * 0.8)
-        new_height = int(seed_surf.get_height() * 0.8)
-        seed_surf = pygame.transform.scale(seed_surf, (new_width, new_height))
-        self.display_surface.blit(seed_surf, seed_rect)
\ No newline at end of file
+        seed_surf, seed_rect = self.seeds_surf[self.player.selected_seed]
+        self.display_surface.blit(seed_surf, seed_rect)
@@ -1,9 +1,19 @@
 import pygame
 from settings import *
 from support import *
+from assets import get_assets
+from profiler import profiler
 from timer import Timer
 
 class Player(pygame.sprite.Sprite):
+    #one folder of frames per animation in images/movement
+    animation_names = ['up', 'down', 'left', 'right',
+                       'up_idle', 'down_idle', 'left_idle', 'right_idle',
+                       'up_axe', 'down_axe', 'left_axe', 'right_axe',
+                       'up_pickaxe', 'down_pickaxe', 'left_pickaxe', 'right_pickaxe',
+                       'up_hoe', 'down_hoe', 'left_hoe', 'right_hoe',
+                       'up_water', 'down_water', 'left_water', 'right_water']
+
     def __init__(self, pos, group, collision_sprites, tree_sprites, interaction, soil_layer, menu_page):
         super().__init__(group)
 
@@ -66,9 +76,8 @@ class Player(pygame.sprite.Sprite):
             self.soil_layer.water(self.target_pos)
         if self.selected_tool == 'axe':
             self.soil_layer.undig(self.target_pos)
-            for tree in self.tree_sprites.sprites():
-                if tree.rect.collidepoint(self.target_pos):
-                    tree.damage()
+            for tree in self.tree_sprites.at(self.target_pos):
+                tree.damage()
 
     def get_target_pos(self):
         self.target_pos = self.rect.center + player_tool_offset[self.status.split('_')[0]]
@@ -77,16 +86,13 @@ class Player(pygame.sprite.Sprite):
         self.soil_layer.plant_seed(self.target_pos, self.selected_seed)
 
     def import_assets(self):
-        self.animations = {'up': [], 'down': [], 'left': [], 'right': [],
-                           'up_idle': [], 'down_idle': [], 'left_idle': [], 'right_idle': [],
-                           'up_axe': [], 'down_axe': [], 'left_axe': [], 'right_axe': [],
-                           'up_pickaxe': [], 'down_pickaxe': [], 'left_pickaxe': [], 'right_pickaxe': [],
-                           'up_hoe': [], 'down_hoe': [], 'left_hoe': [], 'right_hoe': [],
-                           'up_water': [], 'down_water': [], 'left_water': [], 'right_water': []}
-
-        for animation in self.animations.keys():
-            full_path = 'images/movement/' + animation
-            self.animations[animation] = import_folder(full_path)
+        self.animations = {animation: [] for animation in self.animation_names}
+
+        with profiler.phase('player animations'):
+            get_assets().preload(folders = [('images/movement/' + animation, sc) for animation in self.animations]).wait()
+            for animation in self.animations.keys():
+                full_path = 'images/movement/' + animation
+                self.animations[animation] = import_folder(full_path)
 
     def animate(self, dt):
         self.frame_index += 4 * dt
@@ -0,0 +1,73 @@
+from time import perf_counter
+
+from settings import *
+from assets import get_assets
+from level import Level, level_assets
+from profiler import profiler
+
+
+class LevelPreloader:
+    """Builds the level a little at a time while the menu is on screen.
+
+    Every step() runs the next pieces of work until PRELOAD_BUDGET_MS is
+    used up: the level's images are decoded on the worker threads, converted
+    a few per step, then the Level itself is built one piece per step and
+    its first frame prepared. progress goes from 0 to 1; finish() does whatever is left.
+    """
+    def __init__(self, budget_ms = PRELOAD_BUDGET_MS):
+        self.budget = budget_ms / 1000
+        self.progress = 0.0
+        self.level = None
+
+        #the workers start decoding right away
+        self.start = perf_counter()
+        self.batch = get_assets().preload(*level_assets())
+        self.stages = self.work()
+
+    @property
+    def done(self):
+        return self.stages is None
+
+    def work(self):
+        """Yields True after each piece of work, False while waiting on the workers"""
+        total = self.batch.total or 1
+        while self.batch.remaining:
+            #one finished image is converted per piece of work
+            left = self.batch.remaining
+            busy = self.batch.collect(1) < left
+            self.progress = 0.4 * self.batch.progress + 0.4 * (1 - self.batch.remaining / total)
+            yield busy
+        profiler.record('preload/level assets (until converted)', perf_counter() - self.start)
+
+        #the level is built a piece (a part of the farm, the player, the menu...) per step
+        self.progress = 0.8
+        yield True
+        self.level = Level(stepwise = True)
+        pieces = 0
+        for _ in profiler.steps('preload/level', self.level.stages):
+            pieces += 1
+            self.progress = min(0.9, 0.8 + 0.01 * pieces)
+            yield True
+        self.progress = 0.9
+        yield True
+        for _ in profiler.steps('preload/first frame', self.level.all_sprites.preparing(self.level.player)):
+            yield True
+        self.progress = 1.0
+
+    def step(self):
+        if self.done:
+            return
+        deadline = perf_counter() + self.budget
+        for busy in self.stages:
+            if not busy or perf_counter() >= deadline:
+                return
+        self.stages = None
+
+    def finish(self):
+        """Complete the preload right away and return the level"""
+        if not self.done:
+            self.batch.wait()
+            for _ in self.stages:
+                pass
+            self.stages = None
+        return self.level
@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+
+#STARTUP_PROFILE=1 (or python main.py --profile-startup) turns the profiler on
+STARTUP_PROFILE_ENV = 'STARTUP_PROFILE'
+STARTUP_PROFILE_FILE = 'startup_profile.json'
+
+
+class StartupProfiler:
+    """Wall time and allocated memory blocks of named startup phases.
+
+    Phases nest, a phase inside another is recorded as 'outer/inner'.
+    Allocations are the net change in sys.getallocatedblocks(), so they
+    count Python objects still alive when the phase ends (surface pixels
+    live outside the Python allocator and are not included).
+    finish() prints the report and writes it to STARTUP_PROFILE_FILE once.
+    """
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.start = perf_counter()
+        self.stack = []
+        self.phases = []
+        self.finished = False
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        self.stack.append(name)
+        path = '/'.join(self.stack)
+        start = perf_counter()
+        blocks = sys.getallocatedblocks()
+        try:
+            yield
+        finally:
+            self.phases.append({'phase': path,
+                                'ms': (perf_counter() - start) * 1000,
+                                'blocks': sys.getallocatedblocks() - blocks})
+            self.stack.pop()
+
+    def record(self, name, seconds, blocks = 0):
+        """Add a phase that was timed elsewhere (like work spread over frames)"""
+        if self.enabled:
+            self.phases.append({'phase': name, 'ms': seconds * 1000, 'blocks': blocks})
+
+    def steps(self, name, stages):
+        """Pass on the steps of a generator, recording their time (not the time between them) as one phase"""
+        if not self.enabled:
+            yield from stages
+            return
+
+        seconds = 0.0
+        start = perf_counter()
+        for step in stages:
+            seconds += perf_counter() - start
+            yield step
+            start = perf_counter()
+        seconds += perf_counter() - start
+        self.record('/'.join(self.stack + [name]), seconds)
+
+    def report(self):
+        total = (perf_counter() - self.start) * 1000
+        lines = [f'Startup profile, {total:.1f} ms until playable',
+                 f'{"ms":>9} {"blocks":>9}  phase']
+        for phase in sorted(self.phases, key = lambda phase: phase['ms'], reverse = True):
+            lines.append(f'{phase["ms"]:9.1f} {phase["blocks"]:+9d}  {phase["phase"]}')
+        return '\n'.join(lines)
+
+    def finish(self, path = STARTUP_PROFILE_FILE):
+        """Print the report and write the phases as JSON, the first time only"""
+        if not self.enabled or self.finished:
+            return
+        self.finished = True
+        print(self.report())
+        with open(path, 'w') as f:
+            json.dump({'total_ms': (perf_counter() - self.start) * 1000, 'phases': self.phases}, f, indent=4)
+
+
+profiler = StartupProfiler(os.environ.get(STARTUP_PROFILE_ENV) == '1')
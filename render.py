@@ -0,0 +1,327 @@
+import pygame
+from bisect import bisect_left, bisect_right, insort
+from settings import *
+from assets import optimize_surface
+
+
+active_target = None
+
+def get_surface():
+    """Surface the game draws on: the internal target if there is one"""
+    if active_target:
+        return active_target.surface
+    return pygame.display.get_surface()
+
+def mouse_pos():
+    """Mouse position in game coordinates"""
+    if active_target:
+        return active_target.to_logical(pygame.mouse.get_pos())
+    return pygame.mouse.get_pos()
+
+
+class RenderTarget:
+    """The game's SCREEN_WIDTH x SCREEN_HEIGHT surface, presented to the window.
+
+    When the window has the same size the display surface is drawn on
+    directly. Otherwise everything is drawn on an internal surface that is
+    scaled to the window in one pass when the frame is presented. A window
+    too small for whole-number scaling falls back to fractional scaling.
+
+    Assets are still scaled by sc when they load. sc shrinks them (0.6), so
+    drawing at native asset size would make the internal surface and every
+    blit larger, not smaller. This only decouples the window from the game
+    resolution.
+    """
+    def __init__(self, window_size = (WINDOW_WIDTH, WINDOW_HEIGHT), mode = SCALE_MODE, smooth = SMOOTH_SCALING):
+        global active_target
+
+        self.window = pygame.display.set_mode(window_size)
+        self.size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.mode = mode
+        self.smooth = smooth
+
+        width, height = window_size
+        self.scale = min(width // SCREEN_WIDTH, height // SCREEN_HEIGHT)
+        if mode != 'integer' or self.scale < 1:
+            self.mode = 'fractional'
+            self.scale = min(width / SCREEN_WIDTH, height / SCREEN_HEIGHT)
+
+        #letterboxed area of the window the game is scaled into
+        self.dest = pygame.Rect(0, 0, int(SCREEN_WIDTH * self.scale), int(SCREEN_HEIGHT * self.scale))
+        self.dest.center = self.window.get_rect().center
+
+        if self.scale == 1 and self.dest.topleft == (0, 0):
+            self.surface = self.window
+            self.dest_surface = None
+        else:
+            self.surface = pygame.Surface(self.size).convert()
+            self.dest_surface = self.window.subsurface(self.dest)
+        active_target = self
+
+    def to_logical(self, pos):
+        return (int((pos[0] - self.dest.x) / self.scale),
+                int((pos[1] - self.dest.y) / self.scale))
+
+    def to_window(self, rect):
+        left = int(rect.left * self.scale) + self.dest.x
+        top = int(rect.top * self.scale) + self.dest.y
+        right = -int(-rect.right * self.scale) + self.dest.x
+        bottom = -int(-rect.bottom * self.scale) + self.dest.y
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def present(self, rects = None):
+        """Scale the frame to the window and show it, or only the given rects"""
+        if self.dest_surface is None:
+            if rects is None:
+                pygame.display.update()
+            else:
+                pygame.display.update(rects)
+            return
+
+        if rects is not None and self.mode == 'integer' and not self.smooth:
+            #whole pixels map to whole pixels, so each rect scales on its own
+            window_rects = []
+            for rect in rects:
+                rect = rect.clip(self.surface.get_rect())
+                if rect.width and rect.height:
+                    window_rect = self.to_window(rect)
+                    pygame.transform.scale(self.surface.subsurface(rect), window_rect.size,
+                                           self.window.subsurface(window_rect))
+                    window_rects.append(window_rect)
+            pygame.display.update(window_rects)
+            return
+
+        if self.smooth:
+            pygame.transform.smoothscale(self.surface, self.dest.size, self.dest_surface)
+        else:
+            pygame.transform.scale(self.surface, self.dest.size, self.dest_surface)
+
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update([self.to_window(rect) for rect in rects])
+
+
+def merge_rects(rects):
+    """Union overlapping rects so each screen region is redrawn once"""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class BakedBackground:
+    """Static sprites below the main layer flattened into cached chunks.
+
+    Consecutive static layers are merged into one run as long as no dynamic
+    sprite has to be drawn between them. A run is drawn right before the
+    dynamic sprites of its top layer, so the result looks the same as drawing
+    every static sprite on its own.
+    """
+    def __init__(self, chunk_size = BAKE_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.sprites = {}
+        self.runs = {}
+        self.dirty = False
+        self.version = 0
+
+    def add(self, sprite):
+        self.sprites[sprite] = None
+        self.dirty = True
+
+    def remove(self, sprite):
+        if sprite in self.sprites:
+            del self.sprites[sprite]
+            self.dirty = True
+            return True
+        return False
+
+    def is_valid(self, buckets):
+        """A run is broken once a dynamic sprite appears under its top layer"""
+        for top, (bottom, _) in self.runs.items():
+            for layer, bucket in buckets.items():
+                if bottom <= layer < top and bucket:
+                    return False
+        return True
+
+    def bake(self, layers, buckets):
+        for _ in self.baking(layers, buckets):
+            pass
+
+    def baking(self, layers, buckets):
+        """bake() a chunk at a time, yielding after each one"""
+        by_layer = {}
+        for sprite in self.sprites:
+            by_layer.setdefault(sprite.z, []).append(sprite)
+
+        runs = {}
+        run = []
+        for layer in layers:
+            if layer in by_layer:
+                run.append(layer)
+            if run and buckets.get(layer):
+                runs[run[-1]] = (run[0], (yield from self.bake_run(run, by_layer)))
+                run = []
+        if run:
+            runs[run[-1]] = (run[0], (yield from self.bake_run(run, by_layer)))
+        self.runs = runs
+        self.dirty = False
+        self.version += 1
+
+    def bake_run(self, run, by_layer):
+        sprites = [sprite
+                   for layer in run
+                   for sprite in sorted(by_layer[layer], key = lambda sprite: sprite.rect.bottom)]
+        bounds = sprites[0].rect.unionall([sprite.rect for sprite in sprites])
+
+        chunks = []
+        size = self.chunk_size
+        for top in range(bounds.top - bounds.top % size, bounds.bottom, size):
+            for left in range(bounds.left - bounds.left % size, bounds.right, size):
+                rect = pygame.Rect(left, top, size, size)
+                surf = pygame.Surface(rect.size, pygame.SRCALPHA)
+                surf.blits([(sprite.image, sprite.rect.move(-left, -top))
+                            for sprite in sprites if sprite.rect.colliderect(rect)], doreturn=False)
+
+                #skip chunks nothing was drawn on
+                if surf.get_bounding_rect().width:
+                    chunks.append((optimize_surface(surf), rect))
+                    yield
+        return chunks
+
+    def draw(self, surface, layer, offset, area):
+        ox, oy = offset
+        surface.blits([(surf, (rect.x - ox, rect.y - oy))
+                       for surf, rect in self.runs[layer][1] if rect.colliderect(area)], doreturn=False)
+
+
+class RenderQueue:
+    """Keeps sprites bucketed by layer and sorted by rect.bottom between frames.
+
+    Sprites are queued when they join the group (their image, rect and z are
+    only set after pygame adds them) and inserted on the next refresh. After
+    that, a refresh only re-sorts the sprites whose layer or bottom changed.
+    Static sprites below the main layer go to the baked background instead.
+    """
+    def __init__(self):
+        self.layers = sorted(LAYERS.values())
+        self.buckets = {layer: [] for layer in self.layers}
+        self.keys = {layer: [] for layer in self.layers}
+        self.heights = {layer: 0 for layer in self.layers}
+        self.entries = {}
+        self.pending = {}
+        self.background = BakedBackground()
+        self.bake_below = LAYERS['main']
+
+        #non-sprite drawers (like weather particles) drawn on top of a layer
+        self.renderers = {}
+
+    def add(self, sprite):
+        self.pending[sprite] = None
+
+    def add_renderer(self, layer, renderer):
+        """renderer needs draw(surface, offset, area) and an active flag"""
+        self.renderers.setdefault(layer, []).append(renderer)
+        if layer not in self.buckets:
+            insort(self.layers, layer)
+            self.buckets[layer] = []
+            self.keys[layer] = []
+            self.heights[layer] = 0
+
+    @property
+    def animating(self):
+        return any(renderer.active for renderers in self.renderers.values() for renderer in renderers)
+
+    def remove(self, sprite):
+        if sprite in self.entries:
+            self._take(sprite)
+        elif not self.background.remove(sprite):
+            self.pending.pop(sprite, None)
+
+    def _insert(self, sprite):
+        layer = sprite.z
+        if layer not in self.buckets:
+            insort(self.layers, layer)
+            self.buckets[layer] = []
+            self.keys[layer] = []
+            self.heights[layer] = 0
+
+        key = sprite.rect.bottom
+        keys = self.keys[layer]
+        index = bisect_right(keys, key)
+        keys.insert(index, key)
+        self.buckets[layer].insert(index, sprite)
+        self.heights[layer] = max(self.heights[layer], sprite.rect.height)
+        self.entries[sprite] = (layer, key)
+
+    def _take(self, sprite):
+        layer, key = self.entries.pop(sprite)
+        bucket = self.buckets[layer]
+        index = bisect_left(self.keys[layer], key)
+        while bucket[index] is not sprite:
+            index += 1
+        del bucket[index]
+        del self.keys[layer][index]
+
+    def refresh(self):
+        """Insert new sprites and move the ones that changed layer or y"""
+        for _ in self.refreshing():
+            pass
+
+    def refreshing(self):
+        """refresh() that yields after each chunk of the background it bakes"""
+        if self.pending:
+            for sprite in self.pending:
+                if getattr(sprite, 'static', False) and sprite.z < self.bake_below:
+                    self.background.add(sprite)
+                else:
+                    self._insert(sprite)
+            self.pending.clear()
+
+        moved = [sprite
+                 for layer in self.layers
+                 for sprite, key in zip(self.buckets[layer], self.keys[layer])
+                 if sprite.z != layer or sprite.rect.bottom != key]
+        for sprite in moved:
+            self._take(sprite)
+            self._insert(sprite)
+
+        if self.background.dirty or not self.background.is_valid(self.buckets):
+            yield from self.background.baking(self.layers, self.buckets)
+
+    def visible(self, layer, area):
+        """Sprites of a layer whose rect intersects area, in draw order"""
+        keys = self.keys[layer]
+        bucket = self.buckets[layer]
+
+        #bottoms are sorted, so only a slice of the bucket can reach the area
+        start = bisect_right(keys, area.top)
+        end = bisect_left(keys, area.bottom + self.heights[layer], start)
+        left, right = area.left, area.right
+        return [sprite for sprite in bucket[start:end]
+                if sprite.rect.right > left and sprite.rect.left < right and sprite.rect.top < area.bottom]
+
+    def draw(self, surface, offset, area):
+        ox, oy = offset
+        runs = self.background.runs
+        for layer in self.layers:
+            if layer in runs:
+                self.background.draw(surface, layer, offset, area)
+            if self.buckets[layer]:
+                surface.blits([(sprite.image, (sprite.rect.x - ox, sprite.rect.y - oy))
+                               for sprite in self.visible(layer, area)], doreturn=False)
+            for renderer in self.renderers.get(layer, ()):
+                if renderer.active:
+                    renderer.draw(surface, offset, area)
+
+    def snapshot(self, offset, area):
+        """Image and screen rect of every sprite that reaches area"""
+        ox, oy = offset
+        return {sprite: (sprite.image, sprite.rect.move(-ox, -oy))
+                for layer in self.layers if self.buckets[layer]
+                for sprite in self.visible(layer, area)}
@@ -1,4 +1,5 @@
 from pygame.math import Vector2
+from assets import LazyImage
 #scale
 import pygame
 sc = 0.6
@@ -8,6 +9,41 @@ SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 750
 TILE_SIZE = tsc
 
+#window, the game is drawn at SCREEN_WIDTH x SCREEN_HEIGHT and scaled to fit
+WINDOW_WIDTH = SCREEN_WIDTH
+WINDOW_HEIGHT = SCREEN_HEIGHT
+SCALE_MODE = 'integer' # 'integer' keeps pixels square, 'fractional' fills the window
+SMOOTH_SCALING = False
+
+#camera
+CAMERA_MARGIN = 64
+
+#static layers below 'main' are baked into chunks of this size
+BAKE_CHUNK_SIZE = 512
+
+#world map is streamed in chunks, decoded chunks are kept in an LRU
+WORLD_CHUNK_SIZE = 256
+WORLD_CHUNK_CACHE = 48
+
+#water
+WATER_TILE_SIZE = 64
+WATER_ANIMATION_SPEED = 1 # frames per second
+
+#rain, drops and splashes together never exceed the budget
+RAIN_PARTICLE_BUDGET = 3000
+RAIN_SPAWN_RATE = 4000 # drops per second
+
+#opt-in: only redraw and present the screen regions that changed
+DIRTY_RECTS = False
+
+#maps kept built in memory, beyond either limit the least recently visited are serialized
+MAP_CACHE_SIZE = 4
+MAP_CACHE_BUDGET = 128 * 1024 * 1024
+MAP_SPRITE_BYTES = 1024 # rough cost of a sprite and its rects
+
+#main thread time the menu spends per frame building the level in the background
+PRELOAD_BUDGET_MS = 6
+
 #overlay settings
 OVERLAY_POSITIONS = {
     'tool': (50, SCREEN_HEIGHT + 10),
@@ -237,61 +273,22 @@ border2 = [
 
 apple_pos = [(43, 46), (78, 2), (68, 26), (77, 54), (34, 15)]
 
-house_surf = pygame.image.load('images/layers/house.png')
-h_width = int(house_surf.get_width() * sc)
-h_height = int(house_surf.get_height() * sc)
-house_surf = pygame.transform.scale(house_surf, (h_width, h_height))
-
-s_post_surf = pygame.image.load('images/layers/s_post.png')
-sp_width = int(s_post_surf.get_width() * sc)
-sp_height = int(s_post_surf.get_height() * sc)
-s_post_surf = pygame.transform.scale(s_post_surf, (sp_width, sp_height))
-
-post_surf = pygame.image.load('images/layers/post.png')
-p_width = int(post_surf.get_width() * sc)
-p_height = int(post_surf.get_height() * sc)
-post_surf = pygame.transform.scale(post_surf, (p_width, p_height))
-
-s_fence_surf = pygame.image.load('images/layers/s_fence.png')
-sfe_width = int(s_fence_surf.get_width() * sc)
-sfe_height = int(s_fence_surf.get_height() * sc)
-s_fence_surf = pygame.transform.scale(s_fence_surf, (sfe_width, sfe_height))
-
-fence1_surf = pygame.image.load('images/layers/fence_1.png')
-fe1_width = int(fence1_surf.get_width() * sc)
-fe1_height = int(fence1_surf.get_height() * sc)
-fence1_surf = pygame.transform.scale(fence1_surf, (fe1_width, fe1_height))
-
-fence2_surf = pygame.image.load('images/layers/fence_2.png')
-fe2_width = int(fence2_surf.get_width() * sc)
-fe2_height = int(fence2_surf.get_height() * sc)
-fence2_surf = pygame.transform.scale(fence2_surf, (fe2_width, fe2_height))
-
-path_surf = pygame.image.load('images/layers/path.png')
-pa_width = int(path_surf.get_width() * sc)
-pa_height = int(path_surf.get_height() * sc)
-path_surf = pygame.transform.scale(path_surf, (pa_width, pa_height))
-
-s_bridge_surf = pygame.image.load('images/layers/s_bridge.png')
-sb_width = int(s_bridge_surf.get_width() * sc)
-sb_height = int(s_bridge_surf.get_height() * sc)
-s_bridge_surf = pygame.transform.scale(s_bridge_surf, (sb_width, sb_height))
-
-bridge_surf2 = pygame.image.load('images/layers/bridge_2.png')
-b2_width = int(bridge_surf2.get_width() * sc)
-b2_height = int(bridge_surf2.get_height() * sc)
-bridge_surf2 = pygame.transform.scale(bridge_surf2, (b2_width, b2_height))
-
-bridge_surf1 = pygame.image.load('images/layers/bridge_1.png')
-b1_width = int(bridge_surf1.get_width() * sc)
-b1_height = int(bridge_surf1.get_height() * sc)
-bridge_surf1 = pygame.transform.scale(bridge_surf1, (b1_width, b1_height))
+#images are only loaded (through the asset cache) when first used
+house_surf = LazyImage('images/layers/house.png', sc)
+s_post_surf = LazyImage('images/layers/s_post.png', sc)
+post_surf = LazyImage('images/layers/post.png', sc)
+s_fence_surf = LazyImage('images/layers/s_fence.png', sc)
+fence1_surf = LazyImage('images/layers/fence_1.png', sc)
+fence2_surf = LazyImage('images/layers/fence_2.png', sc)
+path_surf = LazyImage('images/layers/path.png', sc)
+s_bridge_surf = LazyImage('images/layers/s_bridge.png', sc)
+bridge_surf2 = LazyImage('images/layers/bridge_2.png', sc)
+bridge_surf1 = LazyImage('images/layers/bridge_1.png', sc)
+bridge_surf3 = LazyImage('images/layers/bridge_3.png', sc)
 
-bridge_surf3 = pygame.image.load('images/layers/bridge_3.png')
-b3_width = int(bridge_surf3.get_width() * sc)
-b3_height = int(bridge_surf3.get_height() * sc)
-bridge_surf3 = pygame.transform.scale(bridge_surf3, (b3_width, b3_height))
+flower_surf = LazyImage('images/objects/flower.png')
 
-flower_surf = pygame.image.load('images/objects/flower.png')
+tree_surf = LazyImage('images/objects/tree.png')
 
-tree_surf = pygame.image.load('images/objects/tree.png')
\ No newline at end of file
+scenery_images = [house_surf, s_post_surf, post_surf, s_fence_surf, fence1_surf, fence2_surf, path_surf,
+                  s_bridge_surf, bridge_surf2, bridge_surf1, bridge_surf3, flower_surf, tree_surf]
@@ -1,9 +1,54 @@
 import pygame
 from settings import *
 from support import import_folder
+from assets import get_assets, surface_bytes
+from world import world_size
+from soil_grid import SoilGrid, FARMABLE, TILLED, WATERED, PLANTED
+from crops import CropTable
 
 from abc import ABC, abstractmethod
 
+def cell_of(pos):
+    """Grid cell (x, y) a world position falls in"""
+    return int(pos[0] // TILE_SIZE), int(pos[1] // TILE_SIZE)
+
+def rect_cells(rect):
+    left, top = cell_of(rect.topleft)
+    right, bottom = cell_of((rect.right - 1, rect.bottom - 1))
+    return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+class CellGroup(pygame.sprite.Group):
+    """A group that also files its sprites under every grid cell they cover.
+
+    Sprites only get their rect after pygame adds them to their groups, so
+    new ones are filed on the next lookup. They must not move afterwards.
+    """
+    def __init__(self, *sprites):
+        self.cells = {}
+        self.filed = {}
+        self.pending = {}
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.pending[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.pending.pop(sprite, None)
+        for cell in self.filed.pop(sprite, ()):
+            self.cells[cell].remove(sprite)
+
+    def at(self, point):
+        """Sprites whose rect contains point"""
+        if self.pending:
+            for sprite in self.pending:
+                self.filed[sprite] = rect_cells(sprite.rect)
+                for cell in self.filed[sprite]:
+                    self.cells.setdefault(cell, []).append(sprite)
+            self.pending.clear()
+        return [sprite for sprite in self.cells.get(cell_of(point), ()) if sprite.rect.collidepoint(point)]
+
 class Growable(ABC):
     @abstractmethod
     def grow(self): pass
@@ -22,6 +67,102 @@ class WaterTile(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(topleft = pos)
         self.z = LAYERS['soil water']
 
+class TileCanvas(pygame.sprite.Sprite):
+    """All tiles of one layer painted onto a single cached surface.
+
+    The surface covers area (the farmable part of the world, large enough
+    for every tile image), so the layer costs one blit per frame however
+    many tiles it holds. image is the part of it tiles were painted on
+    since the last clear, so an empty or small farm does not blit the
+    whole area. Painting or erasing a tile only
+    touches its cell and reports it through invalidate so dirty rect
+    frames pick it up.
+    """
+    def __init__(self, surf, area, z, groups, invalidate):
+        super().__init__(groups)
+        self.surf = surf
+        self.area = pygame.Rect(area)
+        self.surface = pygame.Surface(self.area.size, pygame.SRCALPHA)
+        self.z = z
+        self.invalidate = invalidate
+        self.set_bounds(pygame.Rect(self.area.topleft, (0, 0)))
+
+    def set_bounds(self, bounds):
+        #the render queue only learns a sprite's height when it is inserted, so rejoin the groups
+        groups = self.groups()
+        self.kill()
+        self.rect = bounds
+        self.image = self.surface.subsurface(bounds.move(-self.area.x, -self.area.y))
+        self.add(groups)
+
+    def paint(self, tile):
+        rect = tile.rect.move(-self.area.x, -self.area.y)
+        self.surface.fill((0, 0, 0, 0), rect)
+        self.surface.blit(tile.image, rect)
+        if not self.rect.contains(tile.rect):
+            self.set_bounds(self.rect.union(tile.rect) if self.rect.width else tile.rect.copy())
+        self.invalidate(tile.rect)
+
+    def erase(self, tile):
+        self.surface.fill((0, 0, 0, 0), tile.rect.move(-self.area.x, -self.area.y))
+        self.invalidate(tile.rect)
+
+    def clear(self):
+        self.surface.fill((0, 0, 0, 0))
+        self.invalidate(self.rect)
+        self.set_bounds(pygame.Rect(self.area.topleft, (0, 0)))
+
+class TileSet:
+    """At most one tile sprite per grid cell, killed tiles are kept for reuse.
+
+    The tiles themselves are not drawn, canvas paints them instead.
+    """
+    def __init__(self, tile_type, canvas, groups):
+        self.tile_type = tile_type
+        self.canvas = canvas
+        self.surf = canvas.surf
+        self.groups = groups
+        self.tiles = {}
+        self.pool = []
+
+    def show(self, x, y):
+        tile = self.tiles.get((x, y))
+        if tile is None:
+            pos = (x * TILE_SIZE, y * TILE_SIZE)
+            if self.pool:
+                tile = self.pool.pop()
+                tile.rect.topleft = pos
+                tile.add(self.groups)
+            else:
+                tile = self.tile_type(pos = pos, surf = self.surf, groups = self.groups)
+            self.tiles[(x, y)] = tile
+            self.canvas.paint(tile)
+        return tile
+
+    def hide(self, x, y):
+        tile = self.tiles.pop((x, y), None)
+        if tile is not None:
+            tile.kill()
+            self.canvas.erase(tile)
+            self.pool.append(tile)
+
+    def clear(self):
+        """Hide every tile, the canvas is wiped with one fill"""
+        for tile in self.tiles.values():
+            tile.kill()
+            self.pool.append(tile)
+        self.tiles.clear()
+        self.canvas.clear()
+
+    def rebuild(self, cells):
+        """Show exactly the tiles of cells, the ones already out stay where they are"""
+        cells = list(cells)
+        keep = set(cells)
+        for cell in [cell for cell in self.tiles if cell not in keep]:
+            self.hide(*cell)
+        for x, y in cells:
+            self.show(x, y)
+
 class Plant(pygame.sprite.Sprite, Growable):
     def __init__(self, plant_type, groups, soil, check_watered):
         super().__init__(groups)
@@ -43,16 +184,21 @@ class Plant(pygame.sprite.Sprite, Growable):
 
     def grow(self):
         if self.check_watered(self.rect.center):
-            self.age += self.grow_speed
+            self.set_age(min(self.age + self.grow_speed, self.max_age))
+
+    def set_age(self, age):
+        """Move the plant to age, the image only changes with the growth stage"""
+        stage = int(self.age)
+        self.age = age
 
-            if int(self.age) > 0:
-                self.z = LAYERS['main']
+        if int(age) > 0:
+            self.z = LAYERS['main']
 
-            if self.age >= self.max_age:
-                self.age = self.max_age
-                self.harvestable = True
+        if age >= self.max_age:
+            self.harvestable = True
 
-            self.image = self.frames[int(self.age)]
+        if int(age) != stage:
+            self.image = self.frames[int(age)]
             self.rect = self.image.get_rect(topleft = self.soil.rect.topleft)
 
 
@@ -65,128 +211,153 @@ class SoilLayer:
         self.soil_sprites = pygame.sprite.Group()
         self.water_sprites = pygame.sprite.Group()
         self.plant_sprites = pygame.sprite.Group()
+        self.plants = {}
+        self.crops = CropTable()
+        self.raining = False
 
         #gr
-        self.soil_surf = pygame.image.load('images/soil/soil.png')
+        self.soil_surf = get_assets().acquire('images/soil/soil.png')
+        self.water_surf = get_assets().acquire('images/soil/soil_water.png')
+        self.plant_types = []
 
         self.create_soil_grid()
         self.create_hit_rects()
 
+        #one pooled tile per tilled or watered cell, drawn through a canvas per layer
+        area = self.hit_rects[0].unionall(self.hit_rects) if self.hit_rects else pygame.Rect(0, 0, 0, 0)
+        #tiles are drawn at their image size, which may hang over the cell to the right and below
+        area.width += max(0, max(self.soil_surf.get_width(), self.water_surf.get_width()) - TILE_SIZE)
+        area.height += max(0, max(self.soil_surf.get_height(), self.water_surf.get_height()) - TILE_SIZE)
+        self.soil_canvas = TileCanvas(self.soil_surf, area, LAYERS['soil'], self.all_sprites, self.all_sprites.invalidate)
+        self.water_canvas = TileCanvas(self.water_surf, area, LAYERS['soil water'], self.all_sprites, self.all_sprites.invalidate)
+        self.soil_tiles = TileSet(SoilTile, self.soil_canvas, [self.soil_sprites])
+        self.water_tiles = TileSet(WaterTile, self.water_canvas, [self.water_sprites])
+
+    def preload_plants(self, plant_types):
+        """Decode every growth stage up front so planting never hits the disk"""
+        for plant_type in plant_types:
+            get_assets().acquire_folder(f'images/soil/{plant_type}', sc)
+            self.plant_types.append(plant_type)
+
+    def release_assets(self):
+        """Unpin what this layer acquired, once it is no longer used"""
+        get_assets().release('images/soil/soil.png')
+        get_assets().release('images/soil/soil_water.png')
+        for plant_type in self.plant_types:
+            get_assets().release_folder(f'images/soil/{plant_type}', sc)
+        self.plant_types = []
+
+    def memory(self):
+        return surface_bytes(self.soil_canvas.surface) + surface_bytes(self.water_canvas.surface)
+
     def create_soil_grid(self):
-        ground = pygame.image.load('images/layers/world.png')
-        h_tiles, v_tiles = ground.get_width() // TILE_SIZE, ground.get_height() // TILE_SIZE
+        width, height = world_size()
+        h_tiles, v_tiles = width // TILE_SIZE, height // TILE_SIZE
 
-        self.grid = [[[] for col in range(int(h_tiles))] for row in range(int(v_tiles))]
+        self.grid = SoilGrid(int(h_tiles), int(v_tiles))
         for x, y in farmable_pos:
-            self.grid[y][x].append('F')
-        #print(self.grid)
+            self.grid.set(x, y, FARMABLE)
+
+    def load_grid(self, rows):
+        """Take over a grid saved as nested lists of markers"""
+        self.grid = SoilGrid.from_lists(rows)
+        self.create_soil_tiles()
 
     def create_hit_rects(self):
-        self.hit_rects = []
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'F' in cell:
-                    x = index_col * TILE_SIZE
-                    y = index_row * TILE_SIZE
-                    rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-                    self.hit_rects.append(rect)
+        self.hit_rects = [pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+                          for x, y in self.grid.positions(FARMABLE)]
+
+    def soil_at(self, pos):
+        """The soil tile under a world position, None if the cell is not tilled"""
+        return self.soil_tiles.tiles.get(cell_of(pos))
 
     def get_hit(self, point):
-        for rect in self.hit_rects:
-            if rect.collidepoint(point):
-                x = int(rect.x // TILE_SIZE)
-                y = int(rect.y // TILE_SIZE)
-
-                has_tree = False
-                for tree in self.tree_sprites.sprites():
-                    if tree.rect.collidepoint(point):
-                        has_tree = True
-                        break
-
-                if 'F' in self.grid[y][x] and not has_tree:
-                    #print('farmable')
-                    self.grid[y][x].append('X')
-                    self.create_soil_tiles()
+        x, y = cell_of(point)
+        if self.grid.inside(x, y) and self.grid.has(x, y, FARMABLE) and not self.tree_sprites.at(point):
+            self.grid.set(x, y, TILLED)
+            self.soil_tiles.show(x, y)
+            if self.raining:
+                self.water_all()
 
     def undig(self, point):
         """Remove soil tile at given position"""
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(point):
-                x = int(soil_sprite.rect.x // TILE_SIZE)
-                y = int(soil_sprite.rect.y // TILE_SIZE)
-
-                # Remove soil markers from grid
-                if 'X' in self.grid[y][x]:
-                    self.grid[y][x].remove('X')
-                if 'W' in self.grid[y][x]:
-                    self.grid[y][x].remove('W')
-                if 'P' in self.grid[y][x]:
-                    self.grid[y][x].remove('P')
-
-                # Kill any plants at this position
-                for plant in self.plant_sprites.sprites():
-                    if plant.rect.collidepoint(point):
-                        plant.kill()
-
-                # Kill the soil tile itself
-                soil_sprite.kill()
-
-                # Recreate tiles to reflect changes
-                self.create_soil_tiles()
-                return True
-        return False
+        if not self.soil_at(point):
+            return False
+        x, y = cell_of(point)
+
+        # Remove soil markers and the plant from the cell
+        self.grid.clear(x, y, TILLED | WATERED)
+        self.remove_plant(x, y)
+
+        # Put the soil and water tiles back in their pools
+        self.soil_tiles.hide(x, y)
+        self.water_tiles.hide(x, y)
+        return True
 
     def water(self, target_pos):
-        for soil_sprite in self.soil_sprites:
-            if soil_sprite.rect.collidepoint(target_pos):
-                #print('watered')
-                x = int(soil_sprite.rect.x // TILE_SIZE)
-                y = int(soil_sprite.rect.y // TILE_SIZE)
-                self.grid[y][x].append('W')
-                pos = soil_sprite.rect.topleft
-                WaterTile(pos=pos,
-                          surf=pygame.image.load('images/soil/soil_water.png').convert_alpha(),
-                          groups=[self.all_sprites, self.water_sprites])
+        if self.soil_at(target_pos):
+            x, y = cell_of(target_pos)
+            self.grid.set(x, y, WATERED)
+            self.water_tiles.show(x, y)
 
-    def remove_water(self):
-        for sprite in self.water_sprites.sprites():
-            sprite.kill()
+    def water_all(self):
+        """Rain waters every tilled tile that is still dry"""
+        for x, y in self.grid.positions(TILLED, unless = WATERED):
+            self.water_tiles.show(x, y)
+        self.grid.set_all(WATERED, where = TILLED)
 
-        for row in self.grid:
-            for cell in row:
-                if 'W' in cell:
-                    cell.remove('W')
+    def remove_water(self):
+        self.water_tiles.clear()
+        self.grid.clear_all(WATERED)
 
     def check_watered(self, pos):
         x = int(pos[0] // TILE_SIZE)
         y = int(pos[1] // TILE_SIZE)
-        cell = self.grid[y][x]
-        is_watered = 'W' in cell
-        return is_watered
+        return self.grid.has(x, y, WATERED)
 
     def plant_seed(self, target_pos, seed):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):
-
-                x = int(soil_sprite.rect.x // TILE_SIZE)
-                y = int(soil_sprite.rect.y // TILE_SIZE)
-
-                if 'P' not in self.grid[y][x]:
-                    self.grid[y][x].append('P')
-                    Plant(plant_type=seed,
-                          groups=[self.all_sprites, self.plant_sprites],
-                          soil=soil_sprite,
-                          check_watered=self.check_watered)
+        x, y = cell_of(target_pos)
+        if self.soil_at(target_pos) and not self.grid.has(x, y, PLANTED):
+            self.add_plant(x, y, seed)
+
+    def add_plant(self, x, y, plant_type, age = 0):
+        """Put a new plant on the tilled cell x, y"""
+        plant = Plant(plant_type=plant_type,
+                      groups=[self.all_sprites, self.plant_sprites],
+                      soil=self.soil_tiles.tiles[(x, y)],
+                      check_watered=self.check_watered)
+        plant.set_age(age)
+        self.plants[(x, y)] = plant
+        self.crops.add(self.grid.index(x, y), plant)
+        self.grid.set(x, y, PLANTED)
+        return plant
+
+    def remove_plant(self, x, y):
+        plant = self.plants.pop((x, y), None)
+        if plant is not None:
+            plant.kill()
+            self.crops.remove(self.grid.index(x, y))
+        self.grid.clear(x, y, PLANTED)
+        return plant
+
+    def clear_plants(self):
+        for x, y in list(self.plants):
+            self.remove_plant(x, y)
+
+    def plants_touching(self, rect):
+        """Plants colliding with rect, looked up by cell (a grown plant reaches into the cell below its own)"""
+        plants = []
+        for x, y in rect_cells(rect.inflate(0, TILE_SIZE).move(0, -TILE_SIZE // 2)):
+            plant = self.plants.get((x, y))
+            if plant is not None and plant.rect.colliderect(rect):
+                plants.append(plant)
+        return plants
 
     def update_plants(self):
-        for plant in self.plant_sprites.sprites():
-            plant.grow()
+        """A day of growth for every crop in one pass over the crop table"""
+        return self.crops.grow(self.grid.matches(WATERED))
 
     def create_soil_tiles(self):
-        self.soil_sprites.empty()
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell:
-                    SoilTile(pos=(index_col * TILE_SIZE, index_row * TILE_SIZE),
-                             surf= self.soil_surf.convert_alpha(),
-                             groups=[self.all_sprites, self.soil_sprites])
\ No newline at end of file
+        """Match the soil and water tiles to the whole grid in one go (after a load)"""
+        self.soil_tiles.rebuild(self.grid.positions(TILLED))
+        self.water_tiles.rebuild(self.grid.positions(TILLED | WATERED))
\ No newline at end of file
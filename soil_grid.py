@@ -0,0 +1,154 @@
+from functools import lru_cache
+
+#soil flags, one byte per tile
+FARMABLE = 1
+TILLED = 2
+WATERED = 4
+PLANTED = 8
+
+#the old string markers, in the order a cell lists them
+MARKERS = {'F': FARMABLE, 'X': TILLED, 'W': WATERED, 'P': PLANTED}
+
+#256 byte translate tables, built once for each combination of flags
+@lru_cache(maxsize = None)
+def clear_table(flag):
+    return bytes(flags & ~flag for flags in range(256))
+
+@lru_cache(maxsize = None)
+def set_table(flag, where, unless):
+    return bytes(flags | flag if flags & where == where and not flags & unless else flags for flags in range(256))
+
+@lru_cache(maxsize = None)
+def match_table(where, unless):
+    return bytes(1 if flags & where == where and not flags & unless else 0 for flags in range(256))
+
+
+class SoilGrid:
+    """Soil flags of every tile in one bytearray, row after row.
+
+    Bulk work (clearing all water, counting or finding tiles) runs over the
+    whole buffer in C through bytes.translate, count and find. grid[y][x]
+    still gives a list-like view of a tile's markers ('F', 'X', 'W', 'P')
+    for older callers, and to_lists()/from_lists() read and write the
+    nested lists save files use.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+
+    @classmethod
+    def from_lists(cls, rows):
+        grid = cls(len(rows[0]) if rows else 0, len(rows))
+        for y, row in enumerate(rows):
+            for x, cell in enumerate(row):
+                for marker in cell:
+                    grid.set(x, y, MARKERS[marker])
+        return grid
+
+    def to_lists(self):
+        return [[self.markers(x, y) for x in range(self.width)] for y in range(self.height)]
+
+    def markers(self, x, y):
+        flags = self.cells[y * self.width + x]
+        return [marker for marker, flag in MARKERS.items() if flags & flag]
+
+    def inside(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def index(self, x, y):
+        """Position of a tile in cells"""
+        return y * self.width + x
+
+    def has(self, x, y, flag):
+        return bool(self.cells[y * self.width + x] & flag)
+
+    def set(self, x, y, flag):
+        self.cells[y * self.width + x] |= flag
+
+    def clear(self, x, y, flag):
+        self.cells[y * self.width + x] &= ~flag
+
+    def clear_all(self, flag):
+        """Clear a flag on every tile at once"""
+        self.cells[:] = self.cells.translate(clear_table(flag))
+
+    def set_all(self, flag, where, unless = 0):
+        """Set a flag on every tile that has all of where and none of unless"""
+        self.cells[:] = self.cells.translate(set_table(flag, where, unless))
+
+    def matches(self, flags, unless = 0):
+        """0/1 bytes marking the tiles that have all of flags and none of unless"""
+        return self.cells.translate(match_table(flags, unless))
+
+    def count(self, flags, unless = 0):
+        return self.matches(flags, unless).count(1)
+
+    def positions(self, flags, unless = 0):
+        """(x, y) of every matching tile, row by row"""
+        marks = self.matches(flags, unless)
+        index = marks.find(1)
+        while index != -1:
+            y, x = divmod(index, self.width)
+            yield x, y
+            index = marks.find(1, index + 1)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if not 0 <= y < self.height:
+            raise IndexError('soil grid row out of range')
+        return GridRow(self, y)
+
+    def __iter__(self):
+        return (GridRow(self, y) for y in range(self.height))
+
+
+class GridRow:
+    def __init__(self, grid, y):
+        self.grid = grid
+        self.y = y
+
+    def __len__(self):
+        return self.grid.width
+
+    def __getitem__(self, x):
+        if not 0 <= x < self.grid.width:
+            raise IndexError('soil grid column out of range')
+        return GridCell(self.grid, x, self.y)
+
+    def __iter__(self):
+        return (GridCell(self.grid, x, self.y) for x in range(self.grid.width))
+
+
+class GridCell:
+    """One tile seen as the list of markers it used to be"""
+    def __init__(self, grid, x, y):
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def __contains__(self, marker):
+        return self.grid.has(self.x, self.y, MARKERS[marker])
+
+    def __iter__(self):
+        return iter(self.grid.markers(self.x, self.y))
+
+    def __len__(self):
+        return len(self.grid.markers(self.x, self.y))
+
+    def __eq__(self, other):
+        return self.grid.markers(self.x, self.y) == list(other)
+
+    def __repr__(self):
+        return repr(self.grid.markers(self.x, self.y))
+
+    def append(self, marker):
+        #a flag is either set or not, markers can no longer pile up
+        self.grid.set(self.x, self.y, MARKERS[marker])
+
+    def remove(self, marker):
+        if marker not in self:
+            raise ValueError(f'{marker!r} not in soil cell')
+        self.grid.clear(self.x, self.y, MARKERS[marker])
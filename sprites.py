@@ -1,6 +1,8 @@
 import pygame
 from settings import *
 from timer import Timer
+from assets import load_image, optimize_surface
+from hashlib import sha1
 from random import randint, choice
 
 from abc import ABC, abstractmethod
@@ -18,27 +20,72 @@ class Generic(pygame.sprite.Sprite):
     @abstractmethod
     def update(self, dt): pass
 
+class Static(Generic):
+    """Scenery that never moves or changes its image, so it can be baked"""
+    static = True
+
 class Interaction(Generic):
     def __init__(self, pos, size, groups, name):
         surf = pygame.Surface(size)
         super().__init__(pos, surf, groups)
         self.name = name
 
-class Water(Generic):
-    def __init__(self, pos, frames, groups, z):
-
-        #animation
+class WaterCell(Generic):
+    def __init__(self, pos, frames, groups):
         self.frames = frames
-        self.frame_index = 0
+        super().__init__(pos = pos, surf = frames[0], groups = groups, z = LAYERS['water'])
+
+class Water(pygame.sprite.Sprite):
+    """Animated water cut into small tiles that only cover the water itself.
 
-        #sprite
-        super().__init__(pos = pos, surf = self.frames[self.frame_index], groups = groups, z = LAYERS['water'])
+    Tiles with no water in any frame are dropped and identical tiles share
+    one surface, so memory and fill cost follow the water area, not the map.
+    Only this controller is ticked, a few times per animation frame.
+    """
+    update_interval = 0.1
+
+    def __init__(self, pos, frames, groups, update_group, z, tile_size = WATER_TILE_SIZE, speed = WATER_ANIMATION_SPEED, cells = None, frame_count = None):
+        super().__init__(update_group)
+
+        #animation, with cells given frames may be left out for just their count
+        self.frame_count = len(frames) if frame_count is None else frame_count
+        self.frame_time = 0
+        self.frame_index = 0
+        self.speed = speed
+
+        #tiles, cells that were split before (by the world template) are reused
+        if cells is None:
+            cells = self.split_frames(pos, frames, tile_size)
+        self.cells = [WaterCell(pos = rect.topleft, frames = cell_frames, groups = groups)
+                      for rect, cell_frames in cells]
+
+    @staticmethod
+    def split_frames(pos, frames, tile_size, shared = None):
+        """(rect, frames) of every non-empty tile, identical tiles are shared through shared"""
+        shared = {} if shared is None else shared
+        frame_rect = frames[0].get_rect()
+        for top in range(0, frame_rect.height, tile_size):
+            for left in range(0, frame_rect.width, tile_size):
+                rect = pygame.Rect(left, top, tile_size, tile_size).clip(frame_rect)
+                tiles = [frame.subsurface(rect) for frame in frames]
+                if not any(tile.get_bounding_rect().width for tile in tiles):
+                    continue
+
+                cell_frames = []
+                for tile in tiles:
+                    key = sha1(pygame.image.tobytes(tile, 'RGBA')).digest()
+                    if key not in shared:
+                        shared[key] = optimize_surface(tile.copy())
+                    cell_frames.append(shared[key])
+                yield rect.move(pos), cell_frames
 
     def animate(self, dt):
-        self.frame_index += 1*dt
-        if self.frame_index >= len(self.frames):
-            self.frame_index = 0
-        self.image = self.frames[int(self.frame_index)]
+        #frame time wraps instead of resetting, so the speed holds at any fps
+        self.frame_time = (self.frame_time + self.speed * dt) % self.frame_count
+        if int(self.frame_time) != self.frame_index:
+            self.frame_index = int(self.frame_time)
+            for cell in self.cells:
+                cell.image = cell.frames[self.frame_index]
 
     def update(self, dt):
         self.animate(dt)
@@ -68,12 +115,13 @@ class Particle(Generic):
 
 
 class Tree(Generic, Damageable):
-    def __init__(self, pos, surf, groups, main_render_group, player_add):
+    def __init__(self, pos, surf, groups, main_render_group, player_add, update_group):
         super().__init__(pos, surf, groups)
         self.main_render_group = main_render_group
+        self.update_group = update_group
         self.player_add = player_add
         self.invul_timer = Timer(200)
-        self.apple_surf = pygame.image.load('images/objects/apple.png')
+        self.apple_surf = load_image('images/objects/apple.png')
         self.apple_position = apple_pos
         self.apple_sprites = pygame.sprite.Group()
         self.occupied_positions = set()
@@ -104,6 +152,14 @@ class Tree(Generic, Damageable):
         """Set timer for next regrowth (1-3 days)"""
         self.days_until_regrowth = randint(1, 3)
 
+    def restore_apples(self, pos_indices):
+        """Replace the apples with ones at the given apple positions"""
+        for apple in self.apple_sprites.sprites():
+            apple.kill()
+        self.occupied_positions.clear()
+        for pos_idx in pos_indices:
+            self.spawn_apple(pos_idx)
+
     def spawn_apple(self, pos_idx):
         """Create an apple at specific position"""
         pos = self.apple_position[pos_idx]
@@ -112,7 +168,7 @@ class Tree(Generic, Damageable):
 
         Generic(
             pos=(x, y),
-            surf=self.apple_surf.convert_alpha(),
+            surf=self.apple_surf,
             groups=[self.apple_sprites, self.main_render_group],
             z=LAYERS['fruit']
         )
@@ -136,7 +192,7 @@ class Tree(Generic, Damageable):
         Particle(
             pos=apple.rect.topleft,
             surf=apple.image,
-            groups=[self.main_render_group],
+            groups=[self.main_render_group, self.update_group],
             z=LAYERS['fruit']
         )
 
@@ -163,7 +219,9 @@ class Tree(Generic, Damageable):
         if self.invul_timer.active:
             self.invul_timer.update()
 
-class Block(Generic):
-    def __init__(self, pos, surf, groups):
-        super().__init__(pos, surf, groups)
+class Block(pygame.sprite.Sprite):
+    """Invisible collider, it has no image and only its hitbox is used"""
+    def __init__(self, rect, groups):
+        super().__init__(groups)
+        self.rect = pygame.Rect(rect)
         self.hitbox = self.rect.copy()
\ No newline at end of file
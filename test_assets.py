@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+import pygame
+from unittest.mock import patch
+from assets import AssetCache, DecodePool, SurfaceCache
+
+
+class TestDecodePool(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        for i in range(1, 4):
+            surf = pygame.Surface((10, 6))
+            surf.fill((i * 40, 0, 0))
+            pygame.image.save(surf, os.path.join(self.dir.name, f'{i}.png'))
+
+        #keep the decoded pixels out of the game's own surface cache
+        surface_cache = patch('assets.surface_cache', SurfaceCache(os.path.join(self.dir.name, 'cache')))
+        surface_cache.start()
+        self.addCleanup(surface_cache.stop)
+        self.cache = AssetCache()
+        self.pool = DecodePool(self.cache, workers = 2)
+
+    def tearDown(self):
+        if self.pool.executor:
+            self.pool.executor.shutdown()
+        self.dir.cleanup()
+
+    def test_batch_fills_cache(self):
+        batch = self.pool.submit(folders = [(self.dir.name, 2)]).wait()
+
+        self.assertTrue(batch.done)
+        self.assertEqual(len(self.cache.entries), 3)
+        frames = self.cache.folder(self.dir.name, 2)
+        self.assertEqual([frame.get_size() for frame in frames], [(20, 12)] * 3)
+        self.assertEqual(frames[1].get_at((0, 0))[:3], (80, 0, 0))
+
+    def test_released_folder_can_be_evicted(self):
+        self.cache.acquire_folder(self.dir.name, 2)
+        self.cache.acquire_folder(self.dir.name, 2)
+        self.cache.release_folder(self.dir.name, 2)
+        self.assertEqual(len(self.cache.refs), 3)
+
+        self.cache.budget = 0
+        self.cache.release_folder(self.dir.name, 2)
+        self.assertEqual(self.cache.refs, {})
+        self.assertEqual(self.cache.entries, {})
+
+    def test_cached_images_are_skipped(self):
+        path = os.path.join(self.dir.name, '1.png')
+        self.cache.get(path)
+
+        batch = self.pool.submit([(path, 1), (path, 1)])
+        self.assertEqual(batch.jobs, [])
+        self.assertEqual(batch.progress, 1.0)
+
+
+class TestSurfaceCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'image.png')
+        self.cache = SurfaceCache(os.path.join(self.dir.name, 'cache'))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def save_image(self, color):
+        surf = pygame.Surface((4, 2), pygame.SRCALPHA)
+        surf.fill(color)
+        pygame.image.save(surf, self.path)
+        #make sure the edit shows up in the mtime and size check
+        os.utime(self.path, ns = (0, os.stat(self.path).st_mtime_ns + 10 ** 9))
+        return surf
+
+    def test_round_trip(self):
+        surf = self.save_image((10, 20, 30, 128))
+        self.assertIsNone(self.cache.load(self.path, 2))
+        self.cache.store(self.path, 2, surf)
+
+        cached = self.cache.load(self.path, 2)
+        self.assertEqual(cached.get_size(), (4, 2))
+        self.assertEqual(tuple(cached.get_at((1, 1))), (10, 20, 30, 128))
+
+    def test_changed_source_misses(self):
+        self.cache.store(self.path, 1, self.save_image((255, 0, 0, 255)))
+        self.save_image((0, 255, 0, 255))
+
+        self.assertIsNone(self.cache.load(self.path, 1))
+        self.cache.save()
+        self.assertEqual([name for name in os.listdir(self.cache.cache_dir) if name.endswith('.surf')], [])
+
+    def test_deleted_source_is_dropped(self):
+        self.cache.store(self.path, 1, self.save_image((255, 0, 0, 255)))
+        os.remove(self.path)
+
+        self.cache.save()
+        self.assertEqual(self.cache.index, {})
+        self.assertEqual([name for name in os.listdir(self.cache.cache_dir) if name.endswith('.surf')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
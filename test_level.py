@@ -1,7 +1,14 @@
 import unittest
+from collections import Counter
 import pygame
 from unittest.mock import MagicMock, patch
-from level import Level
+from level import Level, CameraGroup, register_map
+from soil import TileCanvas, SoilTile
+from settings import LAYERS
+from maps import map_builders
+from sprites import Block
+from assets import StubAssets, use_assets
+from settings import TILE_SIZE
 
 
 class TestLevel(unittest.TestCase):
@@ -94,5 +101,148 @@ class TestLevel(unittest.TestCase):
         self.assertIsInstance(level.interaction_sprites, pygame.sprite.Group)
 
 
+class PinCountingAssets(StubAssets):
+    """Stub assets that count how often each folder is pinned"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pins = Counter()
+
+    def acquire_folder(self, path, scale = 1):
+        self.pins[path] += 1
+        return super().acquire_folder(path, scale)
+
+    def release_folder(self, path, scale = 1):
+        self.pins[path] -= 1
+
+
+class TestLevelWithStubAssets(unittest.TestCase):
+    def setUp(self):
+        pygame.init()
+        self.previous = use_assets(StubAssets(sizes = {'images/layers/world.png': (3200, 3200)}))
+
+    def tearDown(self):
+        use_assets(self.previous)
+
+    def test_level_builds_without_files(self):
+        with patch.object(Level, '_instance', None):
+            level = Level()
+
+            self.assertIsInstance(level.player, pygame.sprite.Sprite)
+            self.assertEqual(level.all_sprites.world_rect.size, (3200, 3200))
+            self.assertTrue(level.soil_layer.hit_rects)
+            level.update_sprites.update(0.1)
+
+    def test_evicted_map_is_restored(self):
+        #the fake shed is only registered for this test
+        builders = patch.dict(map_builders)
+        builders.start()
+        self.addCleanup(builders.stop)
+        register_map('shed', lambda game_map, player_add: Block((0, 0, 64, 64), game_map.collision_sprites))
+        with patch.object(Level, '_instance', None):
+            level = Level()
+            level.maps.capacity = 1
+            cell = level.soil_layer.hit_rects[0]
+            level.soil_layer.get_hit(cell.center)
+
+            level.enter_map('shed', (10, 10))
+            self.assertEqual(list(level.maps.resident), ['shed'])
+            self.assertIn('farm', level.maps.cold)
+            self.assertIn(level.player, level.all_sprites)
+
+            level.enter_map('farm')
+            self.assertIn('X', level.soil_layer.grid[cell.y // cell.height][cell.x // cell.width])
+            self.assertEqual(len(level.soil_layer.soil_sprites), 1)
+
+    def test_seed_frames_stay_pinned_across_evictions(self):
+        builders = patch.dict(map_builders)
+        builders.start()
+        self.addCleanup(builders.stop)
+        register_map('shed', lambda game_map, player_add: Block((0, 0, 64, 64), game_map.collision_sprites))
+        assets = PinCountingAssets(sizes = {'images/layers/world.png': (3200, 3200)})
+        use_assets(assets)
+        with patch.object(Level, '_instance', None):
+            level = Level()
+            level.maps.capacity = 1
+            pins = {seed: assets.pins[f'images/soil/{seed}'] for seed in level.player.seeds}
+            self.assertTrue(all(pins.values()))
+
+            level.enter_map('shed', (10, 10))
+            level.enter_map('farm')
+            self.assertIn('farm', level.maps.resident)
+            self.assertEqual({seed: assets.pins[f'images/soil/{seed}'] for seed in level.player.seeds}, pins)
+
+    def test_soil_tiles_are_reused(self):
+        with patch.object(Level, '_instance', None):
+            level = Level()
+            soil_layer = level.soil_layer
+            soil_layer.raining = False
+            sprites = len(level.all_sprites)
+            first, second = [rect.center for rect in soil_layer.hit_rects[:2]]
+            tiles = lambda: len(soil_layer.soil_sprites) + len(soil_layer.water_sprites)
+
+            soil_layer.get_hit(first)
+            soil_layer.get_hit(first)
+            soil_layer.get_hit(second)
+            soil_layer.water(second)
+            self.assertEqual(tiles(), 3)
+
+            tile = soil_layer.soil_tiles.tiles[(second[0] // TILE_SIZE, second[1] // TILE_SIZE)]
+            soil_layer.undig(second)
+            self.assertEqual(tiles(), 1)
+            soil_layer.get_hit(second)
+            self.assertIn(tile, soil_layer.soil_sprites)
+            soil_layer.create_soil_tiles()
+            self.assertEqual(tiles(), 2)
+
+            #tiles are painted on one canvas per layer instead of being drawn on their own
+            self.assertEqual(len(level.all_sprites), sprites)
+            canvas = soil_layer.soil_canvas
+            self.assertEqual(canvas.image.get_at((second[0] - canvas.rect.x, second[1] - canvas.rect.y)).a, 255)
+
+    def test_full_redraws_drop_invalidated_rects(self):
+        with patch.object(Level, '_instance', None):
+            level = Level()
+            soil_layer = level.soil_layer
+            for rect in soil_layer.hit_rects[:3]:
+                soil_layer.get_hit(rect.center)
+                soil_layer.water(rect.center)
+            self.assertTrue(level.all_sprites.invalid_rects)
+
+            level.all_sprites.custom_draw(level.player)
+            self.assertEqual(level.all_sprites.invalid_rects, [])
+
+    def test_every_farmable_cell_can_be_tilled(self):
+        #tiles bigger than a cell hang over the farm on its right and bottom edges
+        use_assets(StubAssets(sizes = {'images/layers/world.png': (3200, 3200),
+                                       'images/soil/soil.png': (64, 64),
+                                       'images/soil/soil_water.png': (64, 64)}))
+        with patch.object(Level, '_instance', None):
+            level = Level()
+            soil_layer = level.soil_layer
+            soil_layer.raining = False
+            for rect in soil_layer.hit_rects:
+                soil_layer.get_hit(rect.center)
+                soil_layer.water(rect.center)
+
+            self.assertEqual(len(soil_layer.water_sprites), len(soil_layer.soil_sprites))
+            self.assertTrue(soil_layer.soil_canvas.area.contains(soil_layer.soil_canvas.rect))
+
+class TestTileCanvas(unittest.TestCase):
+    def test_canvas_grown_upwards_stays_visible(self):
+        pygame.init()
+        pygame.display.set_mode((1, 1))
+        group = CameraGroup()
+        surf = pygame.Surface((64, 64))
+        canvas = TileCanvas(surf, pygame.Rect(0, 0, 640, 6400), LAYERS['soil'], group, group.invalidate)
+
+        canvas.paint(SoilTile((0, 6000), surf, []))
+        group.render_queue.refresh()
+        canvas.paint(SoilTile((0, 100), surf, []))
+        group.render_queue.refresh()
+
+        self.assertEqual(canvas.rect, pygame.Rect(0, 100, 64, 5964))
+        self.assertEqual(group.render_queue.visible(LAYERS['soil'], pygame.Rect(0, 0, 640, 400)), [canvas])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
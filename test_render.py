@@ -0,0 +1,83 @@
+import unittest
+import pygame
+from render import RenderQueue
+
+
+class FakeSprite:
+    def __init__(self, z, bottom):
+        self.z = z
+        self.image = pygame.Surface((4, 4))
+        self.rect = pygame.Rect(0, bottom - 4, 4, 4)
+
+
+class TestRenderQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = RenderQueue()
+
+    def order(self, layer):
+        return [sprite.rect.bottom for sprite in self.queue.buckets[layer]]
+
+    def test_sprites_bucketed_and_sorted(self):
+        for z, bottom in [(8, 30), (1, 50), (8, 10), (8, 20)]:
+            self.queue.add(FakeSprite(z, bottom))
+        self.queue.refresh()
+
+        self.assertEqual(self.order(8), [10, 20, 30])
+        self.assertEqual(self.order(1), [50])
+
+    def test_moved_sprite_is_resorted(self):
+        sprites = [FakeSprite(8, bottom) for bottom in (10, 20, 30)]
+        for sprite in sprites:
+            self.queue.add(sprite)
+        self.queue.refresh()
+
+        sprites[0].rect.bottom = 25
+        self.queue.refresh()
+        self.assertEqual(self.order(8), [20, 25, 30])
+
+    def test_layer_change_and_remove(self):
+        sprite = FakeSprite(7, 10)
+        other = FakeSprite(8, 5)
+        self.queue.add(sprite)
+        self.queue.add(other)
+        self.queue.refresh()
+
+        sprite.z = 8
+        self.queue.refresh()
+        self.assertEqual(self.queue.buckets[7], [])
+        self.assertEqual(self.queue.buckets[8], [other, sprite])
+
+        self.queue.remove(other)
+        self.assertEqual(self.queue.buckets[8], [sprite])
+
+    def test_visible_culls_outside_area(self):
+        inside = FakeSprite(8, 50)
+        below = FakeSprite(8, 500)
+        right = FakeSprite(8, 40)
+        right.rect.x = 300
+        for sprite in (inside, below, right):
+            self.queue.add(sprite)
+        self.queue.refresh()
+
+        self.assertEqual(self.queue.visible(8, pygame.Rect(0, 0, 100, 100)), [inside])
+
+    def test_static_sprites_are_baked(self):
+        ground = FakeSprite(1, 40)
+        ground.static = True
+        shadow = FakeSprite(2, 40)
+        shadow.static = True
+        self.queue.add(ground)
+        self.queue.add(shadow)
+        self.queue.refresh()
+
+        self.assertEqual(self.queue.buckets[1], [])
+        self.assertEqual(list(self.queue.background.runs), [2])
+
+        #a dynamic sprite between the two static layers splits the run
+        self.queue.add(FakeSprite(1, 10))
+        self.queue.refresh()
+        self.assertEqual(sorted(self.queue.background.runs), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 import unittest
 import pygame
 from unittest.mock import MagicMock
-from soil import SoilLayer, Plant, SoilTile, WaterTile, Growable
+from soil import SoilLayer, Plant, SoilTile, WaterTile, Growable, CellGroup
+from soil_grid import SoilGrid, FARMABLE, TILLED, WATERED
+from crops import CropTable
 
 
 class TestOOPConcepts(unittest.TestCase):
@@ -101,5 +103,77 @@ class TestOOPConcepts(unittest.TestCase):
         self.assertIsInstance(growable, pygame.sprite.Sprite)
 
 
+class TestSoilGrid(unittest.TestCase):
+    def setUp(self):
+        self.grid = SoilGrid(4, 3)
+        for x in range(4):
+            self.grid.set(x, 1, FARMABLE)
+        self.grid.set(1, 1, TILLED)
+        self.grid.set(2, 1, TILLED)
+
+    def test_bulk_water(self):
+        self.grid.set_all(WATERED, where = TILLED)
+        self.assertEqual(list(self.grid.positions(WATERED)), [(1, 1), (2, 1)])
+        self.assertEqual(self.grid.count(FARMABLE, unless = TILLED), 2)
+
+        self.grid.clear_all(WATERED)
+        self.assertEqual(self.grid.count(WATERED), 0)
+        self.assertEqual(self.grid.count(TILLED), 2)
+
+    def test_marker_view(self):
+        cell = self.grid[1][2]
+        self.assertIn('X', cell)
+        cell.append('W')
+        cell.append('W')
+        self.assertEqual(cell, ['F', 'X', 'W'])
+        cell.remove('W')
+        with self.assertRaises(ValueError):
+            cell.remove('W')
+
+    def test_list_round_trip(self):
+        rows = self.grid.to_lists()
+        self.assertEqual(rows[1][1], ['F', 'X'])
+        self.assertEqual(SoilGrid.from_lists(rows).cells, self.grid.cells)
+
+
+class TestCellGroup(unittest.TestCase):
+    def test_lookup_follows_membership(self):
+        group = CellGroup()
+        sprite = pygame.sprite.Sprite(group)
+        sprite.rect = pygame.Rect(40, 40, 100, 20)
+
+        self.assertEqual(group.at((130, 50)), [sprite])
+        self.assertEqual(group.at((130, 70)), [])
+        sprite.kill()
+        self.assertEqual(group.at((130, 50)), [])
+
+
+class StubCrop:
+    """Just the parts of a Plant the crop table uses"""
+    def __init__(self):
+        self.age = 0
+        self.grow_speed = 1
+        self.max_age = 3
+        self.frames = ['seed', 'sprout', 'young', 'ripe']
+        self.image = self.frames[0]
+
+    def set_age(self, age):
+        self.age = age
+        self.image = self.frames[int(age)]
+
+
+class TestCropTable(unittest.TestCase):
+    def test_day_grows_watered_rows(self):
+        table = CropTable()
+        crops = [StubCrop() for _ in range(3)]
+        for cell, crop in enumerate(crops):
+            table.add(cell, crop)
+        table.remove(0)
+
+        changed = table.grow(bytes([1, 1, 0]))
+        self.assertEqual(changed, [crops[1]])
+        self.assertEqual([crop.age for crop in crops], [0, 1, 0])
+        self.assertEqual(crops[1].image, 'sprout')
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,11 +1,12 @@
 import pygame
 from settings import *
+from render import get_surface
 
 class Transition:
     def __init__(self, reset, player):
 
         #setup
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = get_surface()
         self.reset = reset
         self.player = player
 
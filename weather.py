@@ -0,0 +1,157 @@
+from array import array
+from random import random, randrange, uniform
+from time import perf_counter
+
+import pygame
+from settings import *
+from assets import optimize_surface
+
+
+class ParticleField:
+    """Particles kept in parallel typed arrays instead of one sprite each.
+
+    Live particles are packed at the front of the arrays. A step ages,
+    moves and drops particles column by column, each column rebuilt in one
+    comprehension, so nothing is allocated per particle.
+    """
+    def __init__(self, capacity, surfs):
+        self.capacity = capacity
+        self.surfs = surfs
+        self.x = array('f', [0.0]) * capacity
+        self.y = array('f', [0.0]) * capacity
+        self.life = array('f', [0.0]) * capacity
+        self.kind = array('B', [0]) * capacity
+        self.count = 0
+
+    @property
+    def active(self):
+        return self.count > 0
+
+    def spawn(self, x, y, life, kind):
+        if self.count == self.capacity:
+            return False
+        i = self.count
+        self.x[i], self.y[i], self.life[i], self.kind[i] = x, y, life, kind
+        self.count += 1
+        return True
+
+    def step(self, dt, dx = 0.0, dy = 0.0):
+        """Age and move every particle, returning where the dead ones ended"""
+        n = self.count
+        x, y, kind = self.x, self.y, self.kind
+        life = array('f', [age - dt for age in self.life[:n]])
+
+        keep = [i for i, age in enumerate(life) if age > 0]
+        count = len(keep)
+        if count == n:
+            ended = []
+            x[:n] = array('f', [value + dx for value in x[:n]])
+            y[:n] = array('f', [value + dy for value in y[:n]])
+            self.life[:n] = life
+            return ended
+
+        ended = [(px, py) for px, py, age in zip(x[:n], y[:n], life) if age <= 0]
+        x[:count] = array('f', [x[i] + dx for i in keep])
+        y[:count] = array('f', [y[i] + dy for i in keep])
+        kind[:count] = array('B', [kind[i] for i in keep])
+        self.life[:count] = array('f', [life[i] for i in keep])
+        self.count = count
+        return ended
+
+    def draw(self, surface, offset, area):
+        ox, oy = offset
+        left, top, right, bottom = area.left, area.top, area.right, area.bottom
+        surfs = self.surfs
+        n = self.count
+        surface.blits([(surfs[k], (x - ox, y - oy))
+                       for x, y, k in zip(self.x[:n], self.y[:n], self.kind[:n])
+                       if left <= x < right and top <= y < bottom], doreturn=False)
+
+
+class Rain(pygame.sprite.Sprite):
+    """Falling drops on the 'rain drops' layer and splashes on 'rain floor'.
+
+    Drops and splashes share one particle budget; spawning stops once it is
+    reached. Particle counts and the cost of the last update are in stats.
+    Rain is only in the update group while it rains or particles are alive.
+    """
+    def __init__(self, all_sprites, update_group, budget = RAIN_PARTICLE_BUDGET, spawn_rate = RAIN_SPAWN_RATE):
+        super().__init__()
+        self.update_group = update_group
+        self.area = all_sprites.viewport
+        self.budget = budget
+        self.spawn_rate = spawn_rate
+        self._raining = False
+        self.spawn_debt = 0.0
+
+        self.drops = ParticleField(budget, self.drop_surfs())
+        self.floor = ParticleField(budget, self.splash_surfs())
+        all_sprites.add_renderer(LAYERS['rain drops'], self.drops)
+        all_sprites.add_renderer(LAYERS['rain floor'], self.floor)
+
+        #drops fall down and slightly to the left
+        self.velocity = (-120, 600)
+        self.stats = {'drops': 0, 'splashes': 0, 'update_ms': 0.0}
+
+    def drop_surfs(self):
+        surfs = []
+        for length in (8, 12, 16):
+            surf = pygame.Surface((4, length), pygame.SRCALPHA)
+            pygame.draw.line(surf, (200, 220, 255, 150), (3, 0), (0, length - 1))
+            surfs.append(optimize_surface(surf))
+        return surfs
+
+    def splash_surfs(self):
+        surfs = []
+        for width in (6, 8, 10):
+            surf = pygame.Surface((width, width // 2), pygame.SRCALPHA)
+            pygame.draw.ellipse(surf, (200, 220, 255, 120), surf.get_rect(), 1)
+            surfs.append(optimize_surface(surf))
+        return surfs
+
+    @property
+    def active(self):
+        return self.drops.active or self.floor.active
+
+    @property
+    def raining(self):
+        return self._raining
+
+    @raining.setter
+    def raining(self, raining):
+        self._raining = raining
+        if raining:
+            self.add(self.update_group)
+
+    def update(self, dt):
+        """Advance the weather by dt, spawning new drops over the camera"""
+        start = perf_counter()
+        area = self.area
+
+        vx, vy = self.velocity
+        for x, y in self.drops.step(dt, vx * dt, vy * dt):
+            if self.drops.count + self.floor.count < self.budget:
+                self.floor.spawn(x, y, uniform(0.2, 0.35), randrange(len(self.floor.surfs)))
+        self.floor.step(dt)
+
+        if self.raining:
+            self.spawn_debt += self.spawn_rate * dt
+            room = self.budget - self.drops.count - self.floor.count
+            amount = min(int(self.spawn_debt), room)
+            self.spawn_debt -= int(self.spawn_debt)
+
+            #drops start above the area so they land inside it
+            kinds = len(self.drops.surfs)
+            left, top = area.left, area.top - vy * 0.2
+            width, height = area.width - vx * 0.4, area.height
+            for _ in range(amount):
+                self.drops.spawn(left + random() * width, top + random() * height,
+                                 uniform(0.35, 0.5), randrange(kinds))
+
+        self.stats['drops'] = self.drops.count
+        self.stats['splashes'] = self.floor.count
+        self.stats['update_ms'] = (perf_counter() - start) * 1000
+
+        #nothing left to tick once the last splash is gone
+        if not self.raining and not self.active:
+            self.kill()
@@ -0,0 +1,188 @@
+import json
+import os
+from collections import OrderedDict
+
+import pygame
+from settings import *
+from assets import get_assets, load_folder
+from sprites import Water
+
+WORLD_IMAGE = 'images/layers/world.png'
+WORLD_CHUNK_DIR = 'images/layers/world'
+
+def load_index(chunk_dir = WORLD_CHUNK_DIR):
+    try:
+        with open(os.path.join(chunk_dir, 'index.json'), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def world_size(chunk_dir = WORLD_CHUNK_DIR, image_path = WORLD_IMAGE):
+    """Map size in pixels from the chunk index, or the world image header"""
+    index = load_index(chunk_dir)
+    if index:
+        return tuple(index['size'])
+    return get_assets().image_size(image_path)
+
+def build_world_chunks(image_path = WORLD_IMAGE, chunk_dir = WORLD_CHUNK_DIR, chunk_size = WORLD_CHUNK_SIZE):
+    """Cut the world image into chunk files and write their index"""
+    world = pygame.image.load(image_path)
+    os.makedirs(chunk_dir, exist_ok = True)
+
+    chunks = {}
+    for top in range(0, world.get_height(), chunk_size):
+        for left in range(0, world.get_width(), chunk_size):
+            rect = pygame.Rect(left, top, chunk_size, chunk_size).clip(world.get_rect())
+            chunk = world.subsurface(rect)
+
+            #nothing to stream for empty chunks
+            if not chunk.get_bounding_rect().width:
+                continue
+            name = f'{left // chunk_size}_{top // chunk_size}.png'
+            pygame.image.save(chunk, os.path.join(chunk_dir, name))
+            chunks[name] = list(rect)
+
+    index = {'size': list(world.get_size()), 'chunk_size': chunk_size, 'chunks': chunks}
+    with open(os.path.join(chunk_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=4)
+    return index
+
+
+class WorldMap:
+    """The world image served as chunks that are decoded on first use.
+
+    Decoded chunks live in their own LRU of at most capacity entries rather
+    than in the asset cache. Without a chunk index the world image is
+    decoded once and cut up in memory.
+    """
+    def __init__(self, chunk_dir = WORLD_CHUNK_DIR, image_path = WORLD_IMAGE, capacity = WORLD_CHUNK_CACHE):
+        self.chunk_dir = chunk_dir
+        self.capacity = capacity
+        self.cache = OrderedDict()
+
+        index = load_index(chunk_dir)
+        if index:
+            self.source = None
+            self.size = tuple(index['size'])
+            self.chunks = {name: pygame.Rect(rect) for name, rect in index['chunks'].items()}
+        else:
+            self.source = get_assets().decode(image_path)
+            self.size = self.source.get_size()
+            self.chunks = {}
+            for top in range(0, self.size[1], WORLD_CHUNK_SIZE):
+                for left in range(0, self.size[0], WORLD_CHUNK_SIZE):
+                    rect = pygame.Rect(left, top, WORLD_CHUNK_SIZE, WORLD_CHUNK_SIZE).clip(self.source.get_rect())
+                    self.chunks[f'{left}_{top}'] = rect
+
+    def chunk(self, name):
+        if name in self.cache:
+            self.cache.move_to_end(name)
+            return self.cache[name]
+
+        if self.source:
+            surf = self.source.subsurface(self.chunks[name])
+        else:
+            surf = get_assets().decode(os.path.join(self.chunk_dir, name))
+        self.cache[name] = surf
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last = False)
+        return surf
+
+
+class WorldChunk(pygame.sprite.Sprite):
+    def __init__(self, name, world_map, groups):
+        super().__init__(groups)
+        self.name = name
+        self.world_map = world_map
+        self.rect = world_map.chunks[name].copy()
+        self.z = LAYERS['ground']
+
+    @property
+    def image(self):
+        #only chunks that get drawn are ever decoded
+        return self.world_map.chunk(self.name)
+
+
+class WorldTemplate:
+    """The fixed part of the farm, built once and shared by every Level.
+
+    scenery holds (surf, pos, z, collides) for each static sprite, colliders
+    the rects of the invisible blocks, and the world map (with its chunk
+    cache) and the split water tiles are shared as they are. Nothing in it
+    changes after it is built; levels only create their sprites from it.
+    With stepwise, the caller runs stages to build it a part at a time.
+    """
+    def __init__(self, stepwise = False):
+        self.assets = get_assets()
+        self.stages = self.build()
+        if not stepwise:
+            for _ in self.stages:
+                pass
+
+    def build(self):
+        self.world_map = WorldMap()
+        self.size = self.world_map.size
+        yield
+
+        main, shadow, soil = LAYERS['main'], LAYERS['shadow'], LAYERS['soil']
+        yield
+        self.scenery = tuple((image.get(), pos, z, collides) for image, pos, z, collides in [
+            (house_surf, (7 * TILE_SIZE - 12, 7 * TILE_SIZE - 270), main, False),
+            (s_post_surf, (12 * TILE_SIZE, 6 * TILE_SIZE + 15), shadow, False),
+            (post_surf, (12 * TILE_SIZE, 6 * TILE_SIZE + 15), main, True),
+            (s_fence_surf, (6 * TILE_SIZE + 9, 6 * TILE_SIZE - 24), shadow, False),
+            (fence1_surf, (6 * TILE_SIZE + 12, 6 * TILE_SIZE - 24), main, True),
+            (fence2_surf, (7 * TILE_SIZE - 12, 9 * TILE_SIZE - 33), main, True),
+            (path_surf, (10 * TILE_SIZE - 9, 8 * TILE_SIZE), soil, False),
+            (s_bridge_surf, (0 * TILE_SIZE, 5 * TILE_SIZE + 18), shadow, False),
+            (bridge_surf3, (0 * TILE_SIZE, 2 * TILE_SIZE - 9), main, False),
+            (bridge_surf1, (0 * TILE_SIZE, 3 * TILE_SIZE), soil, False),
+            (bridge_surf2, (0 * TILE_SIZE, 4 * TILE_SIZE + 6), main, False)])
+
+        colliders = [(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE) for x, y in collision_pos]
+        colliders += [(12 * TILE_SIZE + 12, 7 * TILE_SIZE - 18, 36, 18),
+                      (6 * TILE_SIZE + 3, 9 * TILE_SIZE - 30, 138, 21),
+                      (6 * TILE_SIZE + 3, 6 * TILE_SIZE - 33, 38, 144)]
+        colliders += [(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, 30) for x, y in border1]
+        colliders += [(x * TILE_SIZE + 21, y * TILE_SIZE, TILE_SIZE, TILE_SIZE) for x, y in border2]
+        self.colliders = tuple(colliders)
+
+        water_frames = load_folder('images/layers/water')
+        self.water_frame_count = len(water_frames)
+        yield
+
+        #splitting the water is the slow part, one row of tiles per step
+        #only the tiles are kept, the world sized frames are let go afterwards
+        water_cells = []
+        shared = {}
+        width, height = water_frames[0].get_size()
+        for top in range(0, height, WATER_TILE_SIZE):
+            band = pygame.Rect(0, top, width, min(WATER_TILE_SIZE, height - top))
+            water_cells.extend(Water.split_frames(band.topleft,
+                                                  [frame.subsurface(band) for frame in water_frames],
+                                                  WATER_TILE_SIZE, shared))
+            yield
+        self.water_cells = tuple(water_cells)
+
+
+template = None
+
+def build_template():
+    """world_template() a part at a time, yields while building and returns the template"""
+    global template
+    if template is None or template.assets is not get_assets():
+        building = WorldTemplate(stepwise = True)
+        yield from building.stages
+        template = building
+    return template
+
+def world_template():
+    """The shared WorldTemplate, (re)built when the asset provider changes"""
+    for _ in build_template():
+        pass
+    return template
+
+
+if __name__ == '__main__':
+    index = build_world_chunks()
+    print(f"Wrote {len(index['chunks'])} chunks of {index['chunk_size']}px to {WORLD_CHUNK_DIR}")